@@ -0,0 +1,38 @@
+"""Benchmark queue drain with and without batching."""
+
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.live import push_event, game_start, game_end
+from benchmarks.stub import StubCentralServer
+
+GAMES = 4
+EVENTS = 100
+LATENCY = 0.005
+
+
+def drain(server, **kwargs):
+    """Queue a burst of events for several games and drain the queue."""
+    with ChainballCentralAPI(server.address, **kwargs) as api:
+        for game in range(GAMES):
+            game_start(api, f"game{game}", 0, ["a", "b", "c", "d"])
+        for event in range(EVENTS):
+            for game in range(GAMES):
+                push_event(api, f"game{game}", "score", {"event": event})
+        for game in range(GAMES):
+            game_end(api, f"game{game}", "done", "a", 1200, 0)
+        posts = server.posts
+        start = time.perf_counter()
+        api.process_queue()
+        return time.perf_counter() - start, server.posts - posts
+
+
+if __name__ == "__main__":
+    with StubCentralServer(latency=LATENCY) as stub:
+        unbatched, unbatched_posts = drain(stub)
+        batched, batched_posts = drain(stub, batch_size=50)
+    print(
+        f"{GAMES * (EVENTS + 2)} events: unbatched {unbatched:.3f}s "
+        f"({unbatched_posts} requests), batched {batched:.3f}s "
+        f"({batched_posts} requests)"
+    )
@@ -0,0 +1,40 @@
+"""Benchmark pooled session against one connection per request."""
+
+import time
+
+import requests
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.live import push_event
+from benchmarks.stub import StubCentralServer
+
+EVENTS = 500
+
+
+def unpooled_post(api, data, sub_api=None, path=None, timeout=10):
+    """POST with a new connection, as done before pooling."""
+    url = "/".join([api.server_address, sub_api, path])
+    return requests.post(url, timeout=timeout, data=data).json()
+
+
+def drain(api):
+    """Push and deliver events, return elapsed time."""
+    start = time.perf_counter()
+    for event in range(EVENTS):
+        push_event(api, "game", "score", {"event": event})
+    api.process_queue()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    with StubCentralServer() as server:
+        with ChainballCentralAPI(server.address) as api:
+            pooled = drain(api)
+            api._central_api_post = lambda **kwargs: unpooled_post(
+                api, **kwargs
+            )
+            unpooled = drain(api)
+    print(
+        f"{EVENTS} events: pooled {pooled * 1e3 / EVENTS:.2f}ms/event, "
+        f"unpooled {unpooled * 1e3 / EVENTS:.2f}ms/event"
+    )
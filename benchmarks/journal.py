@@ -0,0 +1,37 @@
+"""Benchmark pushing events with and without the durable journal."""
+
+import tempfile
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.journal import OutgoingJournal
+from cbcentral.live import push_event
+
+EVENTS = 10000
+
+
+def push(api):
+    """Push events, return time per event."""
+    start = time.perf_counter()
+    for event in range(EVENTS):
+        push_event(api, "game", "score", {"event": event})
+    return (time.perf_counter() - start) / EVENTS
+
+
+if __name__ == "__main__":
+    memory = push(ChainballCentralAPI("http://localhost"))
+    with tempfile.TemporaryDirectory() as journal_path:
+        with ChainballCentralAPI(
+            "http://localhost", journal=OutgoingJournal(journal_path)
+        ) as api:
+            journaled = push(api)
+        start = time.perf_counter()
+        replayed = OutgoingJournal(journal_path)
+        replay = time.perf_counter() - start
+        pending = len(replayed.pending)
+        replayed.close()
+    print(
+        f"{EVENTS} events: in memory {memory * 1e6:.1f}us/event, "
+        f"journaled {journaled * 1e6:.1f}us/event, "
+        f"replay of {pending} pending {replay * 1e3:.1f}ms"
+    )
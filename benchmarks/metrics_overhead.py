@@ -0,0 +1,56 @@
+"""Benchmark the overhead of the built-in metrics."""
+
+import timeit
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.metrics import MetricsRegistry, prometheus_text
+from benchmarks.stub import StubCentralServer
+
+CALLS = 200000
+REQUESTS = 500
+
+
+def per_call(statement, **names):
+    """Get time per call of statement, in nanoseconds."""
+    timer = timeit.Timer(statement, globals=names)
+    return min(timer.repeat(3, CALLS)) / CALLS * 1e9
+
+
+if __name__ == "__main__":
+    metrics = MetricsRegistry()
+    counter = metrics.counter("counter", "Counter.")
+    histogram = metrics.histogram("histogram", "Histogram.", ("endpoint",))
+    child = histogram.labels("api/games")
+    for label, cost in (
+        ("counter inc", per_call("counter.inc()", counter=counter)),
+        ("histogram observe", per_call("child.observe(0.01)", child=child)),
+        (
+            "labels + observe",
+            per_call(
+                "histogram.labels('api/games').observe(0.01)",
+                histogram=histogram,
+            ),
+        ),
+    ):
+        print(f"{label}: {cost:.0f}ns")
+
+    with StubCentralServer({"api/games": []}) as server:
+        with ChainballCentralAPI(server.address, metrics=metrics) as api:
+            observe = per_call(
+                "api._observe_request('GET', 'api', 'games', 0.0)", api=api
+            )
+            request = (
+                timeit.timeit(
+                    "api.central_api_get(sub_api='api', path='games')",
+                    globals={"api": api},
+                    number=REQUESTS,
+                )
+                / REQUESTS
+                * 1e9
+            )
+    print(
+        f"request instrumentation {observe:.0f}ns, "
+        f"{observe / request:.3%} of a {request / 1e6:.2f}ms local GET"
+    )
+    export = timeit.timeit(lambda: prometheus_text(metrics), number=100) / 100
+    print(f"prometheus export: {export * 1e3:.2f}ms")
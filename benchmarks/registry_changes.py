@@ -0,0 +1,45 @@
+"""Benchmark computing change sets when applying upstream updates."""
+
+import tempfile
+import time
+
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+SIZES = (10000, 100000)
+CHANGED = 0.01
+
+
+def timed(function, *args):
+    """Call function, return result and elapsed time."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(size):
+    """Apply unchanged and slightly changed upstream contents."""
+    games = make_games(size)
+    updated = [dict(game) for game in games]
+    for game in updated[:: int(1 / CHANGED)]:
+        game["game_status"] = (
+            "DONE" if game["game_status"] != "DONE" else "LIVE"
+        )
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path)
+        registry.build_registry(games)
+        registry.commit_registry()
+        registry = LocalGameRegistry(db_path)
+        # no fingerprints after loading, every entry is built and compared
+        _, first = timed(registry.build_registry, games)
+        _, unchanged = timed(registry.build_registry, games)
+        changes, changed = timed(registry.build_registry, updated)
+    print(
+        f"{size:>7} games: first update {first:.2f}s, unchanged "
+        f"{unchanged:.2f}s, {len(changes.modified)} modified {changed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    for registry_size in SIZES:
+        bench(registry_size)
@@ -0,0 +1,48 @@
+"""Benchmark registry commits of small changes."""
+
+import copy
+import tempfile
+import time
+
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+SIZE = 20000
+COMMITS = 20
+CHANGES = 10
+
+
+def bench(journal):
+    """Commit a few changes at a time, return time per commit."""
+    games = make_games(SIZE)
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, journal=journal)
+        registry.build_registry(games)
+        registry.commit_registry()
+
+        start = time.perf_counter()
+        for _ in range(COMMITS):
+            registry.commit_registry()
+        unchanged = (time.perf_counter() - start) / COMMITS
+
+        elapsed = 0.0
+        for commit in range(COMMITS):
+            games = copy.copy(games)
+            for offset in range(CHANGES):
+                index = commit * CHANGES + offset
+                games[index] = dict(games[index], game_status="DONE")
+            registry.build_registry(games)
+            start = time.perf_counter()
+            registry.commit_registry()
+            elapsed += time.perf_counter() - start
+    return unchanged, elapsed / COMMITS
+
+
+if __name__ == "__main__":
+    for journal in (False, True):
+        unchanged, changed = bench(journal)
+        print(
+            f"{SIZE} games, journal={journal!s:<5}: no-op commit "
+            f"{unchanged * 1e6:.1f}us, {CHANGES} changes "
+            f"{changed * 1e3:.2f}ms"
+        )
@@ -0,0 +1,63 @@
+"""Benchmark lazy registry entries against building all of them."""
+
+import gc
+import tempfile
+import time
+import tracemalloc
+
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+SIZES = (10000, 100000)
+
+
+def load(db_path, **kwargs):
+    """Load registry, return it, start-up time and retained memory."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    registry = LocalGameRegistry(db_path, snapshot=True, **kwargs)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return registry, elapsed, retained
+
+
+def lookups(registry, size):
+    """Time lookups by index and by court."""
+    start = time.perf_counter()
+    for identifier in range(0, size, 7):
+        registry[identifier]
+    by_index = time.perf_counter() - start
+    start = time.perf_counter()
+    games = registry.find(court="1", game_status="LIVE")
+    by_court = time.perf_counter() - start
+    return by_index, by_court, len(games)
+
+
+def bench(size):
+    """Compare eager and lazy registries loaded from the same snapshot."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, snapshot=True)
+        registry.build_registry(make_games(size))
+        registry.commit_registry()
+        registry.close()
+        del registry
+
+        for label, kwargs in (("eager", {}), ("lazy", {"lazy": True})):
+            registry, elapsed, retained = load(db_path, **kwargs)
+            by_index, by_court, found = lookups(registry, size)
+            registry.close()
+            del registry
+            print(
+                f"{size:>7} games {label:>5}: start-up {elapsed:.2f}s, "
+                f"{retained / (1 << 20):.1f} MiB retained; "
+                f"{size // 7 + 1} index lookups {by_index * 1e3:.0f}ms, "
+                f"court lookup {by_court * 1e3:.1f}ms ({found} games)"
+            )
+
+
+if __name__ == "__main__":
+    for registry_size in SIZES:
+        bench(registry_size)
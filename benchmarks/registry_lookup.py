@@ -0,0 +1,48 @@
+"""Benchmark registry lookups and rebuilds."""
+
+import tempfile
+import timeit
+
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+SIZES = (1000, 10000, 100000)
+LOOKUPS = 1000
+
+
+def linear_getitem(registry, item):
+    """Look up entry by scanning, as done before indexing."""
+    for element in registry:
+        if element.index == item:
+            return element
+    raise KeyError(item)
+
+
+def bench(size):
+    """Run benchmark for a registry size."""
+    games = make_games(size)
+    keys = [game["identifier"] for game in games[:: max(1, size // LOOKUPS)]]
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path)
+        build = timeit.timeit(lambda: registry.build_registry(games), number=1)
+        rebuild = timeit.timeit(
+            lambda: registry.build_registry(games), number=1
+        )
+        indexed = timeit.timeit(
+            lambda: [registry[key] for key in keys], number=1
+        )
+        # a full linear scan would make a 100k rebuild take hours
+        linear = timeit.timeit(
+            lambda: [linear_getitem(registry, key) for key in keys], number=1
+        )
+    print(
+        f"{size:>7} entries: build {build:.3f}s, rebuild {rebuild:.3f}s, "
+        f"{len(keys)} lookups indexed {indexed * 1e3:.2f}ms, "
+        f"linear {linear * 1e3:.2f}ms "
+        f"(rebuild with linear lookups ~{linear * size / len(keys):.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    for bench_size in SIZES:
+        bench(bench_size)
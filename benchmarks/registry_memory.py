@@ -0,0 +1,36 @@
+"""Benchmark memory retained by a loaded game registry."""
+
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+SIZES = (10000, 100000)
+
+
+def retained_memory(size):
+    """Load registry from disk, return memory retained by it."""
+    with tempfile.TemporaryDirectory() as db_path:
+        with open(os.path.join(db_path, "game_registry.json"), "w") as f:
+            json.dump(make_games(size), f)
+        gc.collect()
+        tracemalloc.start()
+        registry = LocalGameRegistry(db_path)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    del registry
+    return retained
+
+
+if __name__ == "__main__":
+    for size in SIZES:
+        retained = retained_memory(size)
+        print(
+            f"{size:>7} games: {retained / (1 << 20):.1f} MiB, "
+            f"{retained / size:.0f} bytes per game"
+        )
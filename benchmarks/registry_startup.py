@@ -0,0 +1,63 @@
+"""Benchmark registry start-up from JSON and from a binary snapshot."""
+
+import json
+import os
+import tempfile
+import time
+
+from cbcentral.localdb.game import GameEntry, LocalGameRegistry
+from cbcentral.registry.snapshot import SnapshotReader
+from benchmarks.synth import make_games
+
+SIZES = (10000, 100000)
+
+
+def timed(function, *args, **kwargs):
+    """Call function, return result and elapsed time."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench(size):
+    """Compare loading the same registry both ways."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, snapshot=True)
+        registry.build_registry(make_games(size))
+        registry.commit_registry()
+        registry.close()
+        json_path = os.path.join(db_path, "game_registry.json")
+        snapshot_path = os.path.join(db_path, "game_registry.snapshot")
+
+        def _parse_json():
+            with open(json_path) as registry_file:
+                return json.load(registry_file)
+
+        def _parse_snapshot():
+            reader = SnapshotReader(snapshot_path, GameEntry)
+            contents = list(reader)
+            reader.close()
+            return contents
+
+        def _index_only():
+            reader = SnapshotReader(snapshot_path, GameEntry)
+            identifiers = reader.column("identifier")
+            reader.close()
+            return identifiers
+
+        _, parse_json = timed(_parse_json)
+        _, parse_snapshot = timed(_parse_snapshot)
+        _, index_only = timed(_index_only)
+        _, start_json = timed(LocalGameRegistry, db_path)
+        _, start_snapshot = timed(LocalGameRegistry, db_path, snapshot=True)
+    print(
+        f"{size:>7} games: parse json {parse_json:.3f}s, "
+        f"snapshot {parse_snapshot:.3f}s (index column only "
+        f"{index_only * 1e3:.1f}ms); start-up json {start_json:.2f}s, "
+        f"snapshot {start_snapshot:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    for registry_size in SIZES:
+        bench(registry_size)
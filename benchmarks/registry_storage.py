@@ -0,0 +1,66 @@
+"""Benchmark registry storage backends."""
+
+import copy
+import tempfile
+import time
+
+from cbcentral.localdb.game import GameEntry, LocalGameRegistry
+from cbcentral.registry.storage import SQLiteStorage
+from benchmarks.synth import make_games
+
+SIZE = 100000
+CHANGES = 10
+QUERIES = 100
+
+
+def timed(function, *args, **kwargs):
+    """Call function, return result and elapsed time."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench(storage):
+    """Fill, change and reopen a registry."""
+    games = make_games(SIZE)
+    kwargs = {} if storage is None else {"storage": storage}
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, **kwargs)
+        registry.build_registry(games)
+        _, fill = timed(registry.commit_registry)
+        games = copy.copy(games)
+        for index in range(CHANGES):
+            games[index] = dict(games[index], game_status="DONE")
+        registry.build_registry(games)
+        _, commit = timed(registry.commit_registry)
+        registry.close()
+        registry, reopen = timed(LocalGameRegistry, db_path, **kwargs)
+        registry.close()
+        print(
+            f"{'sqlite' if storage else 'json':<6}: fill {fill:.2f}s, "
+            f"commit {CHANGES} changes {commit * 1e3:.1f}ms, "
+            f"open registry {reopen:.2f}s"
+        )
+        if storage is None:
+            return
+        sqlite, opening = timed(
+            SQLiteStorage, db_path, "game_registry", GameEntry
+        )
+        _, get = timed(lambda: [sqlite.get(index) for index in range(QUERIES)])
+        _, find = timed(
+            lambda: [
+                sqlite.find(players=f"player{player}", court="1")
+                for player in range(QUERIES)
+            ]
+        )
+        sqlite.close()
+        print(
+            f"        open storage only {opening * 1e3:.1f}ms, "
+            f"get {get / QUERIES * 1e6:.0f}us, "
+            f"find by player and court {find / QUERIES * 1e3:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    bench(None)
+    bench(SQLiteStorage)
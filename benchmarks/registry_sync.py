@@ -0,0 +1,53 @@
+"""Benchmark sequential and concurrent refresh of all registries."""
+
+import tempfile
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.localdb.announcement import LocalAnnounceRegistry
+from cbcentral.localdb.game import LocalGameRegistry
+from cbcentral.localdb.player import LocalPlayerRegistry
+from cbcentral.localdb.tournament import LocalTournamentRegistry
+from cbcentral.registry.sync import RegistrySync
+from benchmarks.stub import StubCentralServer
+from benchmarks.synth import make_games
+
+LATENCY = 0.2
+
+
+def make_registries(db_path):
+    """Create registries."""
+    return [
+        LocalGameRegistry(db_path),
+        LocalTournamentRegistry(db_path),
+        LocalAnnounceRegistry(db_path),
+        LocalPlayerRegistry(db_path),
+    ]
+
+
+if __name__ == "__main__":
+    collections = {
+        "api/games": make_games(1000),
+        "api/tournaments": [],
+        "api/announce": [],
+        "api/players": [],
+    }
+    with StubCentralServer(collections, latency=LATENCY) as server:
+        with tempfile.TemporaryDirectory() as db_path:
+            with ChainballCentralAPI(server.address) as api:
+                start = time.perf_counter()
+                for registry in make_registries(db_path):
+                    registry.update_registry(api)
+                    registry.commit_registry()
+                sequential = time.perf_counter() - start
+            with ChainballCentralAPI(server.address) as api:
+                registry_sync = RegistrySync(make_registries(db_path), api)
+                start = time.perf_counter()
+                report = registry_sync.sync()
+                concurrent = time.perf_counter() - start
+    print(
+        f"{LATENCY * 1e3:.0f}ms per endpoint: sequential {sequential:.3f}s, "
+        f"concurrent {concurrent:.3f}s"
+    )
+    for name, timings in report.items():
+        print(name, {step: round(value, 4) for step, value in timings.items()})
@@ -0,0 +1,43 @@
+"""Benchmark steady-state SFX checksum checks with and without cache."""
+
+import os
+import tempfile
+import time
+
+from cbcentral.util import ChecksumCache, md5_sum
+
+FILES = 500
+FILE_SIZE = 65536
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as sfx_path:
+        file_names = []
+        for index in range(FILES):
+            file_name = os.path.join(sfx_path, f"player{index}")
+            with open(file_name, "wb") as sfx_file:
+                sfx_file.write(os.urandom(FILE_SIZE))
+            # not recently modified
+            os.utime(file_name, (time.time() - 60, time.time() - 60))
+            file_names.append(file_name)
+
+        start = time.perf_counter()
+        for file_name in file_names:
+            md5_sum(file_name)
+        uncached = time.perf_counter() - start
+
+        cache_path = os.path.join(sfx_path, "sfx_checksums.json")
+        cache = ChecksumCache(cache_path)
+        for file_name in file_names:
+            cache.md5_sum(file_name)
+        cache.save()
+
+        start = time.perf_counter()
+        cache = ChecksumCache(cache_path)
+        for file_name in file_names:
+            cache.md5_sum(file_name)
+        cached = time.perf_counter() - start
+    print(
+        f"{FILES} files of {FILE_SIZE // 1024}KiB: hashing {uncached:.3f}s, "
+        f"cached {cached:.3f}s"
+    )
@@ -0,0 +1,56 @@
+"""Benchmark SFX sync of players sharing clips, with and without dedup."""
+
+import tempfile
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.localdb.player import LocalPlayerRegistry
+from benchmarks.stub import StubCentralServer
+from benchmarks.synth import make_players
+
+PLAYERS = 200
+DISTINCT_CLIPS = 20
+LATENCY = 0.01
+
+
+def rename_players(collections):
+    """Rename all players, keeping their clips."""
+    renamed = []
+    for player in collections["api/players"]:
+        username = f"{player['username']}-renamed"
+        collections[f"api/players/{username}/get_sfx_data"] = collections[
+            f"api/players/{player['username']}/get_sfx_data"
+        ]
+        renamed.append(dict(player, username=username))
+    collections["api/players"] = renamed
+
+
+def sync_twice(server, collections, dedup):
+    """Sync into an empty SFX directory, then again after a rename."""
+    with tempfile.TemporaryDirectory() as db_path:
+        with tempfile.TemporaryDirectory() as sfx_path:
+            registry = LocalPlayerRegistry(
+                db_path, sfx_path, sfx_workers=4, sfx_dedup=dedup
+            )
+            with ChainballCentralAPI(server.address) as api:
+                start = time.perf_counter()
+                registry.update_registry(api)
+                first = time.perf_counter() - start
+                gets = server.gets
+                rename_players(collections)
+                start = time.perf_counter()
+                registry.update_registry(api)
+                second = time.perf_counter() - start
+    return first, second, gets
+
+
+if __name__ == "__main__":
+    for dedup in (False, True):
+        _, collections = make_players(PLAYERS, distinct_clips=DISTINCT_CLIPS)
+        with StubCentralServer(collections, latency=LATENCY) as stub:
+            first, second, gets = sync_twice(stub, collections, dedup)
+            renamed_gets = stub.gets - gets
+        print(
+            f"dedup={dedup!s:<5}: first {first:.2f}s ({gets} GETs), "
+            f"after renaming {second:.2f}s ({renamed_gets} GETs)"
+        )
@@ -0,0 +1,56 @@
+"""Benchmark peak memory of SFX downloads against clip size.
+
+The stub server runs in a child process so that only the client side is
+traced.
+"""
+
+import multiprocessing
+import tempfile
+import tracemalloc
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.localdb.player import LocalPlayerRegistry
+from benchmarks.stub import StubCentralServer
+from benchmarks.synth import make_players
+
+PLAYERS = 4
+CLIP_SIZES = (1 << 16, 1 << 20, 1 << 23)
+
+
+def serve(clip_size, connection):
+    """Serve synthetic players until told to stop."""
+    _, collections = make_players(PLAYERS, clip_size=clip_size)
+    with StubCentralServer(collections) as stub:
+        connection.send(stub.address)
+        connection.recv()
+
+
+def peak_memory(address):
+    """Sync players, return peak traced memory of the SFX check."""
+    with tempfile.TemporaryDirectory() as db_path:
+        with tempfile.TemporaryDirectory() as sfx_path:
+            registry = LocalPlayerRegistry(db_path, sfx_path)
+            with ChainballCentralAPI(address) as api:
+                contents = registry.fetch_upstream(api)
+                tracemalloc.start()
+                registry.apply_upstream(contents, api)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+    return peak, registry.sfx_report
+
+
+if __name__ == "__main__":
+    for clip_size in CLIP_SIZES:
+        parent, child = multiprocessing.Pipe()
+        server = multiprocessing.Process(target=serve, args=(clip_size, child))
+        server.start()
+        try:
+            peak, summary = peak_memory(parent.recv())
+        finally:
+            parent.send(None)
+            server.join()
+        print(
+            f"{clip_size >> 10:>5} KiB clips: "
+            f"peak {peak / (1 << 20):.1f} MiB, "
+            f"{summary['updated']} updated"
+        )
@@ -0,0 +1,39 @@
+"""Benchmark SFX synchronization with several worker counts."""
+
+import tempfile
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.localdb.player import LocalPlayerRegistry
+from benchmarks.stub import StubCentralServer
+from benchmarks.synth import make_players
+
+PLAYERS = 500
+LATENCY = 0.01
+WORKERS = (1, 4, 16)
+
+
+def first_sync(server, workers):
+    """Sync players into an empty SFX directory."""
+    with tempfile.TemporaryDirectory() as db_path:
+        with tempfile.TemporaryDirectory() as sfx_path:
+            registry = LocalPlayerRegistry(
+                db_path, sfx_path, sfx_workers=workers
+            )
+            with ChainballCentralAPI(server.address, pool_size=workers) as api:
+                start = time.perf_counter()
+                registry.update_registry(api)
+                elapsed = time.perf_counter() - start
+    return elapsed, registry.sfx_report
+
+
+if __name__ == "__main__":
+    _, collections = make_players(PLAYERS)
+    with StubCentralServer(collections, latency=LATENCY) as stub:
+        for worker_count in WORKERS:
+            duration, summary = first_sync(stub, worker_count)
+            print(
+                f"{PLAYERS} players, {worker_count:>2} workers: "
+                f"{duration:.2f}s, {summary['updated']} updated, "
+                f"{summary['failed']} failed"
+            )
@@ -0,0 +1,109 @@
+"""Local stand-in for the central server API."""
+
+import json
+import threading
+import time
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, payload=None):
+        """Send JSON reply."""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Serve collections."""
+        time.sleep(self.server.latency)
+        self.server.gets += 1
+        path = self.path.strip("/")
+        if path not in self.server.collections:
+            self._reply(404)
+            return
+        self._reply(200, self.server.collections[path])
+
+    def do_POST(self):
+        """Accept live updates."""
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        time.sleep(self.server.latency)
+        self.server.posts += 1
+        if "batch" in form:
+            batch = json.loads(form["batch"][0])
+            self.server.events += len(batch)
+            self._reply(
+                200,
+                {"status": "ok", "results": [{"status": "ok"}] * len(batch)},
+            )
+            return
+        self.server.events += 1
+        self._reply(200, {"status": "ok"})
+
+    def log_message(self, *args):
+        """Be quiet."""
+
+
+class StubCentralServer:
+    """Serve API endpoints from memory on a local port."""
+
+    def __init__(self, collections=None, latency=0.0):
+        """Initialize."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.collections = collections if collections else {}
+        self._server.latency = latency
+        self._server.gets = 0
+        self._server.posts = 0
+        self._server.events = 0
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+
+    @property
+    def address(self):
+        """Get server address."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def gets(self):
+        """Get number of GET requests served."""
+        return self._server.gets
+
+    @property
+    def posts(self):
+        """Get number of POST requests served."""
+        return self._server.posts
+
+    @property
+    def events(self):
+        """Get number of events received, counting batched ones."""
+        return self._server.events
+
+    def start(self):
+        """Start serving."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        """Enter context."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context."""
+        self.stop()
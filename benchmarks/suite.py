@@ -0,0 +1,295 @@
+"""Benchmark suite with machine-readable results.
+
+Runs repeatable benchmarks of the registry, queue and SFX paths on
+synthetic data, served by a local stub server where needed, and writes
+the results as JSON. Results can be checked against an earlier run to
+catch regressions:
+
+    python -m benchmarks.suite --scale medium --output baseline.json
+    python -m benchmarks.suite --scale medium --baseline baseline.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.live import push_event, game_start, game_end
+from cbcentral.localdb.announcement import LocalAnnounceRegistry
+from cbcentral.localdb.game import LocalGameRegistry
+from cbcentral.localdb.player import LocalPlayerRegistry
+from cbcentral.localdb.tournament import LocalTournamentRegistry
+from cbcentral.registry.sync import RegistrySync
+from benchmarks.stub import StubCentralServer
+from benchmarks.synth import SCALES, make_collections
+
+SUITE_VERSION = 1
+# fraction of games changed by an update
+CHANGED = 0.01
+LOOKUPS = 10000
+QUEUE_GAMES = 4
+
+BENCHMARKS = {}
+
+
+def benchmark(function):
+    """Register benchmark.
+
+    Benchmarks are called with the run context and return the elapsed
+    times of the steps they measure.
+    """
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+class Context:
+    """Data and stub server shared by the benchmarks of a run."""
+
+    def __init__(self, scale, collections, server):
+        """Initialize."""
+        self.scale = scale
+        self.collections = collections
+        self.server = server
+
+    @property
+    def games(self):
+        """Get upstream games."""
+        return self.collections["api/games"]
+
+    def updated_games(self):
+        """Get upstream games with some of them changed."""
+        games = [dict(game) for game in self.games]
+        for game in games[:: int(1 / CHANGED)]:
+            game["game_status"] = (
+                "DONE" if game["game_status"] != "DONE" else "LIVE"
+            )
+        return games
+
+
+def timed(function, *args, **kwargs):
+    """Call function, return result and elapsed time."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@benchmark
+def registry_build(context):
+    """Build a game registry, then apply changed and unchanged updates."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path)
+        _, build = timed(registry.build_registry, context.games)
+        updated = context.updated_games()
+        _, update = timed(registry.build_registry, updated)
+        _, unchanged = timed(registry.build_registry, updated)
+        registry.close()
+    return {"build": build, "update": update, "unchanged": unchanged}
+
+
+@benchmark
+def registry_lookup(context):
+    """Look up games by index and by court."""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path)
+        registry.build_registry(context.games)
+        identifiers = [
+            rng.randrange(len(context.games)) for _ in range(LOOKUPS)
+        ]
+
+        def _lookup():
+            for identifier in identifiers:
+                registry[identifier]
+
+        _, lookup = timed(_lookup)
+        _, find = timed(registry.find, court="1", game_status="LIVE")
+        registry.close()
+    return {"lookup": lookup, "find": find}
+
+
+@benchmark
+def registry_commit(context):
+    """Commit a game registry in full and incrementally."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, journal=True)
+        registry.build_registry(context.games)
+        _, full = timed(registry.commit_registry)
+        registry.build_registry(context.updated_games())
+        _, incremental = timed(registry.commit_registry)
+        registry.close()
+    return {"full": full, "incremental": incremental}
+
+
+@benchmark
+def registry_load(context):
+    """Load a game registry from JSON, a snapshot and lazily."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path, snapshot=True)
+        registry.build_registry(context.games)
+        registry.commit_registry()
+        registry.close()
+        results = {}
+        for name, kwargs in (
+            ("json", {}),
+            ("snapshot", {"snapshot": True}),
+            ("lazy", {"snapshot": True, "lazy": True}),
+        ):
+            registry, results[name] = timed(
+                LocalGameRegistry, db_path, **kwargs
+            )
+            registry.close()
+    return results
+
+
+@benchmark
+def queue_drain(context):
+    """Drain queued live events, unbatched and batched."""
+    events = min(250, SCALES[context.scale]["games"] // 100)
+    results = {}
+    for name, kwargs in (("unbatched", {}), ("batched", {"batch_size": 50})):
+        with ChainballCentralAPI(context.server.address, **kwargs) as api:
+            for game in range(QUEUE_GAMES):
+                game_start(api, f"game{game}", 0, ["a", "b", "c", "d"])
+            for event in range(events):
+                for game in range(QUEUE_GAMES):
+                    push_event(api, f"game{game}", "score", {"event": event})
+            for game in range(QUEUE_GAMES):
+                game_end(api, f"game{game}", "done", "a", 1200, 0)
+            _, results[name] = timed(api.process_queue)
+    return results
+
+
+@benchmark
+def sfx_sync(context):
+    """Download player SFX into an empty directory, then check again."""
+    with tempfile.TemporaryDirectory() as db_path:
+        with tempfile.TemporaryDirectory() as sfx_path:
+            registry = LocalPlayerRegistry(db_path, sfx_path)
+            with ChainballCentralAPI(context.server.address) as api:
+                _, first = timed(registry.update_registry, api)
+                # nothing to download, SFX checksums are compared
+                _, again = timed(registry.update_registry, api)
+            registry.close()
+    return {"first": first, "again": again}
+
+
+@benchmark
+def registry_sync(context):
+    """Synchronize all registries."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registries = [
+            LocalGameRegistry(db_path),
+            LocalTournamentRegistry(db_path),
+            LocalAnnounceRegistry(db_path),
+            LocalPlayerRegistry(db_path),
+        ]
+        with ChainballCentralAPI(context.server.address) as api:
+            _, sync = timed(RegistrySync(registries, api).sync)
+        for registry in registries:
+            registry.close()
+    return {"sync": sync}
+
+
+def run(scale, repeat, latency, names):
+    """Run benchmarks, return results."""
+    collections = make_collections(scale)
+    results = {}
+    with StubCentralServer(collections, latency=latency) as server:
+        context = Context(scale, collections, server)
+        for name in names:
+            runs = [BENCHMARKS[name](context) for _ in range(repeat)]
+            results[name] = {
+                step: {
+                    "min": min(result[step] for result in runs),
+                    "median": statistics.median(
+                        result[step] for result in runs
+                    ),
+                    "max": max(result[step] for result in runs),
+                }
+                for step in runs[0]
+            }
+    return {
+        "suite_version": SUITE_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "sizes": SCALES[scale],
+        "repeat": repeat,
+        "latency": latency,
+        "results": results,
+    }
+
+
+def regressions(report, baseline, tolerance):
+    """Get steps whose median time grew by more than tolerance."""
+    found = []
+    for name, steps in report["results"].items():
+        for step, timing in steps.items():
+            try:
+                before = baseline["results"][name][step]["median"]
+            except KeyError:
+                continue
+            if timing["median"] > before * (1 + tolerance):
+                found.append((f"{name}.{step}", before, timing["median"]))
+    return found
+
+
+def main(argv=None):
+    """Run suite from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.001, help="stub latency, seconds"
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=BENCHMARKS, help="benchmarks to run"
+    )
+    parser.add_argument("--output", help="write JSON results to file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed slowdown against the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.scale, args.repeat, args.latency, args.only or list(BENCHMARKS)
+    )
+    for name, steps in report["results"].items():
+        summary = ", ".join(
+            f"{step} {timing['median'] * 1e3:.1f}ms"
+            for step, timing in steps.items()
+        )
+        print(f"{name}: {summary}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            found = regressions(report, json.load(baseline), args.tolerance)
+        for step, before, after in found:
+            print(
+                f"regression: {step} {before * 1e3:.1f}ms -> "
+                f"{after * 1e3:.1f}ms",
+                file=sys.stderr,
+            )
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
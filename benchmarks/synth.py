@@ -0,0 +1,137 @@
+"""Synthetic upstream data."""
+
+import base64
+import hashlib
+import random
+
+SERVER = "https://www.chainball.online"
+GAME_STATUSES = ["NYET", "NEXT", "LIVE", "DONE"]
+TOURNAMENT_STATUSES = ["SCHD", "LIVE", "DONE"]
+
+# registry sizes by scale
+SCALES = {
+    "small": {"games": 1000, "tournaments": 10, "players": 50},
+    "medium": {"games": 10000, "tournaments": 100, "players": 200},
+    "large": {"games": 100000, "tournaments": 1000, "players": 1000},
+}
+
+
+def player_url(player):
+    """Build player URL as returned by the central API."""
+    return f"{SERVER}/api/players/{player}/"
+
+
+def make_games(count, players=200, courts=4, tournaments=10, seed=0):
+    """Generate upstream game records."""
+    rng = random.Random(seed)
+    games = []
+    for identifier in range(count):
+        game_players = rng.sample(range(players), 4)
+        games.append(
+            {
+                "identifier": identifier,
+                "sequence": identifier,
+                "description": f"game {identifier}",
+                "tournament": f"{SERVER}/api/tournaments/"
+                f"{rng.randrange(tournaments)}/",
+                "events": [],
+                "players": [
+                    player_url(f"player{player}") for player in game_players
+                ],
+                "duration": 1200,
+                "start_time": None,
+                "game_status": rng.choice(GAME_STATUSES),
+                "court": f"{SERVER}/api/courts/{rng.randrange(courts)}/",
+            }
+        )
+    return games
+
+
+def make_players(count, clip_size=16384, seed=0, distinct_clips=None):
+    """Generate upstream player records and their SFX endpoints.
+
+    Returns the player records and a collection mapping for the stub
+    server with the players and each player's SFX data. If distinct_clips
+    is set, players share that many different clips.
+    """
+    rng = random.Random(seed)
+    clips = [rng.randbytes(clip_size) for _ in range(distinct_clips or count)]
+    players = []
+    collections = {}
+    for index in range(count):
+        username = f"player{index}"
+        clip = clips[index % len(clips)]
+        players.append(
+            {
+                "name": f"Player {index}",
+                "display_name": f"P{index}",
+                "username": username,
+                "sfx_md5": hashlib.md5(clip).hexdigest(),
+            }
+        )
+        collections[f"api/players/{username}/get_sfx_data"] = {
+            "status": "ok",
+            "data": base64.b64encode(clip).decode(),
+        }
+    collections["api/players"] = players
+    return players, collections
+
+
+def make_tournaments(count, games=0, players=200, seed=0):
+    """Generate upstream tournament records, games are split among them."""
+    rng = random.Random(seed)
+    tournaments = []
+    for identifier in range(count):
+        tournaments.append(
+            {
+                "id": identifier,
+                "season": f"{SERVER}/api/seasons/{identifier // 10}/",
+                "description": f"tournament {identifier}",
+                "event_date": f"2020-01-{identifier % 28 + 1:02d}",
+                "players": [
+                    player_url(f"player{player}")
+                    for player in rng.sample(range(players), min(players, 8))
+                ],
+                "status": rng.choice(TOURNAMENT_STATUSES),
+                "games": [
+                    f"{SERVER}/api/games/{game}/"
+                    for game in range(identifier, games, count)
+                ],
+            }
+        )
+    return tournaments
+
+
+def make_announcements(count, players=200, courts=4, seed=0):
+    """Generate upstream announcement records."""
+    rng = random.Random(seed)
+    return [
+        {
+            "identifier": identifier,
+            "players": [
+                player_url(f"player{player}")
+                for player in rng.sample(range(players), 4)
+            ],
+            "court": f"{SERVER}/api/courts/{rng.randrange(courts)}/",
+        }
+        for identifier in range(count)
+    ]
+
+
+def make_collections(scale, clip_size=16384, seed=0):
+    """Generate stub server collections for all registries at a scale."""
+    sizes = SCALES[scale]
+    _, collections = make_players(sizes["players"], clip_size, seed)
+    collections["api/games"] = make_games(
+        sizes["games"],
+        players=sizes["players"],
+        tournaments=sizes["tournaments"],
+        seed=seed,
+    )
+    collections["api/tournaments"] = make_tournaments(
+        sizes["tournaments"], sizes["games"], sizes["players"], seed
+    )
+    collections["api/announce"] = make_announcements(
+        max(1, sizes["games"] // 100), sizes["players"], seed=seed
+    )
+    return collections
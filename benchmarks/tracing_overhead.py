@@ -0,0 +1,68 @@
+"""Benchmark the overhead of tracing hooks."""
+
+import statistics
+import tempfile
+import time
+import timeit
+
+from cbcentral import tracing
+from cbcentral.localdb.game import LocalGameRegistry
+from benchmarks.synth import make_games
+
+CALLS = 200000
+GAMES = 10000
+ROUNDS = 7
+
+
+def span_cost():
+    """Get time of an empty span, in nanoseconds."""
+    timer = timeit.Timer(
+        "with span('x', key=1):\n    pass", globals={"span": tracing.span}
+    )
+    return min(timer.repeat(3, CALLS)) / CALLS * 1e9
+
+
+def build_time(games):
+    """Get time to build a registry from scratch."""
+    with tempfile.TemporaryDirectory() as db_path:
+        registry = LocalGameRegistry(db_path)
+        start = time.perf_counter()
+        registry.build_registry(games)
+        elapsed = time.perf_counter() - start
+        registry.close()
+    return elapsed
+
+
+def build_times(games, hook):
+    """Get median build times without and with a hook.
+
+    Runs alternate between the two cases after a warm-up build, so that
+    neither benefits from running on a warmed-up process.
+    """
+    build_time(games)
+    times = {False: [], True: []}
+    for round_number in range(ROUNDS):
+        for enabled in (False, True)[:: 1 if round_number % 2 else -1]:
+            if enabled:
+                tracing.add_hook(hook)
+            try:
+                times[enabled].append(build_time(games))
+            finally:
+                if enabled:
+                    tracing.remove_hook(hook)
+    return statistics.median(times[False]), statistics.median(times[True])
+
+
+if __name__ == "__main__":
+    games = make_games(GAMES)
+    hook = tracing.TraceHook()
+    disabled = span_cost()
+    tracing.add_hook(hook)
+    enabled = span_cost()
+    tracing.remove_hook(hook)
+    build_disabled, build_enabled = build_times(games, hook)
+    print(f"span without hooks {disabled:.0f}ns, with a hook {enabled:.0f}ns")
+    print(
+        f"build {GAMES} games, median of {ROUNDS}: without hooks "
+        f"{build_disabled:.3f}s, with a hook {build_enabled:.3f}s"
+    )
@@ -1,10 +1,38 @@
 """Server API access."""
 
+import functools
+import itertools
+import json
 import posixpath
-from collections import deque
+import threading
+import time
+import weakref
+from logging import getLogger
 
 import requests
-from requests.exceptions import ConnectionError, Timeout
+from requests.adapters import HTTPAdapter
+from requests.exceptions import (
+    ChunkedEncodingError,
+    ConnectionError,
+    Timeout,
+)
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    MaxRetryError,
+    NewConnectionError,
+    ReadTimeoutError,
+)
+from urllib3.util.retry import Retry
+
+from cbcentral import tracing
+from cbcentral.breaker import CircuitBreaker, OPEN
+from cbcentral.metrics import METRICS
+from cbcentral.outgoing import OutgoingQueue, OutgoingRequest, PRIORITY_NORMAL
+
+API_LOGGER = getLogger("cbcentral.api")
+
+# seconds to wait after an unexpected error in the delivery thread
+WORKER_ERROR_DELAY = 1.0
 
 
 class CBCentralAPIError(Exception):
@@ -15,110 +43,728 @@ class CBCentralAPITimeout(CBCentralAPIError):
     """Timeout."""
 
 
-class ChainballCentralAPI:
-    """Central API."""
+class CBCentralAPIUnavailable(CBCentralAPIError):
+    """Request refused while the circuit breaker is open."""
+
+
+class _Retry(Retry):
+    """Retry policy that gives up on timeouts at once.
+
+    Refused connections are still retried, and so are connections reset
+    during idempotent requests.
+    """
+
+    def increment(self, method=None, url=None, *args, error=None, **kwargs):
+        """Get retry state after a failed attempt."""
+        if isinstance(error, ReadTimeoutError):
+            # surfaces as requests.exceptions.ReadTimeout
+            raise error
+        if isinstance(error, ConnectTimeoutError) and not isinstance(
+            error, NewConnectionError
+        ):
+            # surfaces as requests.exceptions.ConnectTimeout
+            raise MaxRetryError(kwargs.get("_pool"), url, error) from error
+        return super().increment(method, url, *args, error=error, **kwargs)
+
+
+class CentralAPIBase:
+    """State shared by the blocking and asyncio central API clients."""
+
+    def __init__(
+        self,
+        cbserver_addr,
+        cbserver_key=None,
+        batch_size=None,
+        batch_linger=0.0,
+        backoff_base=0.5,
+        backoff_max=60.0,
+        max_attempts=None,
+        expiry=None,
+        journal=None,
+        metrics=None,
+        breaker_threshold=5,
+        breaker_timeout=10.0,
+    ):
+        """Initialize.
+
+        Queued requests are scheduled by cbcentral.outgoing.OutgoingQueue,
+        which takes the batching, backoff and expiry parameters.
+
+        If a journal (cbcentral.journal.OutgoingJournal) is given, queued
+        requests are recorded in it until delivered or given up on, and
+        requests left over from a previous run are queued again. The
+        journal is closed along with the API object.
+
+        Request latencies and errors and the state of the outgoing queue
+        are recorded in metrics (cbcentral.metrics.MetricsRegistry), by
+        default cbcentral.metrics.METRICS. The queue gauges follow the
+        last API object created with the same metrics.
 
-    def __init__(self, cbserver_addr, cbserver_key=None):
-        """Initialize."""
+        After breaker_threshold consecutive timeouts, connection errors or
+        server errors, the circuit breaker (cbcentral.breaker) opens:
+        requests fail with CBCentralAPIUnavailable without contacting the
+        server and queued requests are held until a trial request after
+        breaker_timeout seconds succeeds.
+        """
         super().__init__()
-        self._outgoing_queue = deque()
+        self._outgoing_queue = OutgoingQueue(
+            batch_size=batch_size,
+            batch_linger=batch_linger,
+            backoff_base=backoff_base,
+            backoff_max=backoff_max,
+            max_attempts=max_attempts,
+            expiry=expiry,
+        )
+        self._queue_lock = threading.Condition()
+        # groups with a delivery in progress, kept in order by not taking
+        # another batch of them until it is completed or restored
+        self._in_flight = set()
+        self._journal = journal
+        self._request_ids = itertools.count()
+        if journal is not None:
+            self._replay_journal()
         self._address = cbserver_addr
         self._key = cbserver_key if cbserver_key is not None else ""
+        self._validators = {}
+        self._breaker = CircuitBreaker(breaker_threshold, breaker_timeout)
+        self._init_metrics(metrics if metrics is not None else METRICS)
+
+    def _init_metrics(self, metrics):
+        """Declare metrics."""
+        self._request_seconds = metrics.histogram(
+            "cbcentral_api_request_seconds",
+            "Central API request latency in seconds.",
+            ("method", "endpoint"),
+        )
+        self._request_errors = metrics.counter(
+            "cbcentral_api_errors_total",
+            "Failed central API requests.",
+            ("method", "endpoint", "error"),
+        )
+        self._delivered = metrics.counter(
+            "cbcentral_queue_delivered_total",
+            "Queued requests delivered.",
+        )
+        self._retries = metrics.counter(
+            "cbcentral_queue_retries_total",
+            "Queued requests rescheduled after a failed delivery.",
+        )
+        self._dead = metrics.counter(
+            "cbcentral_queue_dead_letters_total",
+            "Queued requests given up on.",
+        )
+        # do not keep the API object alive from the metrics
+        api_ref = weakref.ref(self)
+
+        def _queue_depth():
+            api = api_ref()
+            return api.queue_length if api is not None else 0
+
+        def _oldest_age():
+            api = api_ref()
+            if api is None:
+                return 0.0
+            return max(
+                (lane["age"] for lane in api.lane_stats().values()),
+                default=0.0,
+            )
+
+        def _breaker_open():
+            api = api_ref()
+            return int(api is not None and api.breaker_state == OPEN)
+
+        metrics.gauge(
+            "cbcentral_queue_depth", "Queued requests."
+        ).set_function(_queue_depth)
+        metrics.gauge(
+            "cbcentral_queue_oldest_age_seconds",
+            "Age of the oldest queued request in seconds.",
+        ).set_function(_oldest_age)
+        metrics.gauge(
+            "cbcentral_api_breaker_open",
+            "Whether the circuit breaker is open.",
+        ).set_function(_breaker_open)
+        self._rejected = metrics.counter(
+            "cbcentral_api_rejected_total",
+            "Requests refused while the circuit breaker was open.",
+            ("method",),
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _endpoint_name(sub_api=None, path=None):
+        """Get endpoint name for metrics, without identifiers."""
+        segments = [
+            segment
+            for part in (sub_api, path)
+            if part is not None
+            for segment in part.split("/")
+            if segment
+        ]
+        if len(segments) > 3:
+            # identifiers between the collection and the action
+            segments[2:-1] = ["*"]
+        return "/".join(segments)
+
+    def _observe_request(
+        self, method, sub_api, path, start, error=None, status=None
+    ):
+        """Record request latency and failure.
+
+        Timeouts, connection errors and server errors count as failures
+        for the circuit breaker, other responses as successes.
+        """
+        endpoint = self._endpoint_name(sub_api, path)
+        self._request_seconds.labels(method, endpoint).observe(
+            time.perf_counter() - start
+        )
+        if error is None and status not in (None, 200, 304):
+            error = "status"
+        if error is not None:
+            self._request_errors.labels(method, endpoint, error).inc()
+        if error in ("timeout", "connection") or (
+            status is not None and status >= 500
+        ):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+
+    def _check_breaker(self, method):
+        """Refuse request while the circuit breaker is open."""
+        if not self._breaker.allow():
+            self._rejected.labels(method).inc()
+            raise CBCentralAPIUnavailable(
+                "central server unavailable, retry in {:.1f}s".format(
+                    self._breaker.retry_after()
+                )
+            )
+
+    @property
+    def breaker_state(self):
+        """Get circuit breaker state."""
+        return self._breaker.state
+
+    def _replay_journal(self):
+        """Queue requests that were pending in the journal."""
+        now = time.monotonic()
+        pending = self._journal.pending
+        for ident, record in pending.items():
+            self._outgoing_queue.push(
+                OutgoingRequest(**record, timestamp=now, ident=ident)
+            )
+        if pending:
+            self._request_ids = itertools.count(max(pending) + 1)
 
     @property
     def server_address(self):
         """Get server address."""
         return self._address
 
+    def _build_url(self, sub_api=None, path=None):
+        """Build request URL."""
+        url = self._address
+        if sub_api is not None:
+            url = posixpath.join(url, sub_api)
+
+        if path is not None:
+            url = posixpath.join(url, path)
+
+        return url
+
+    def _conditional_headers(self, url):
+        """Get headers for a conditional request."""
+        headers = {}
+        etag, last_modified = self._validators.get(url, (None, None))
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _store_validators(self, url, headers):
+        """Remember validators from response headers."""
+        self._validators[url] = (
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+        )
+
+    def forget_validators(self, sub_api=None, path=None):
+        """Forget validators, next conditional requests are unconditional.
+
+        Only validators of one URL are forgotten if it is given.
+        """
+        if sub_api is None and path is None:
+            self._validators.clear()
+        else:
+            self._validators.pop(self._build_url(sub_api, path), None)
+
+    def push_post_request(
+        self,
+        data,
+        sub_api=None,
+        path=None,
+        retry=True,
+        group=None,
+        batch_path=None,
+        priority=PRIORITY_NORMAL,
+    ):
+        """Push post request into queue.
+
+        Requests of the same group are delivered in order. Requests with a
+        batch path may be delivered together to it when batching is
+        enabled. Groups whose next request has a higher priority (lower
+        value) are served first.
+        """
+        with self._queue_lock:
+            request = OutgoingRequest(
+                data,
+                sub_api,
+                path,
+                retry,
+                group=group,
+                batch_path=batch_path,
+                priority=priority,
+                timestamp=time.monotonic(),
+                ident=next(self._request_ids),
+            )
+            if self._journal is not None:
+                self._journal.append(request.ident, request.record)
+            self._outgoing_queue.push(request)
+            self._queue_lock.notify()
+        self._queue_changed()
+
+    def _queue_changed(self):
+        """Request was queued."""
+
+    def _take_batch(self):
+        """Take next requests to be delivered, of a group not in flight."""
+        with self._queue_lock:
+            batch = self._outgoing_queue.take(exclude=self._in_flight)
+            if batch:
+                self._in_flight.add(batch[0].group)
+            return batch
+
+    def _release_group(self, batch):
+        """Mark group of a batch as no longer in flight."""
+        self._in_flight.discard(batch[0].group)
+        self._queue_lock.notify_all()
+
+    def _restore_batch(self, batch):
+        """Put requests back at the front of their lane, as not attempted."""
+        with self._queue_lock:
+            self._outgoing_queue.restore(batch)
+            self._release_group(batch)
+        self._queue_changed()
+
+    def _delivery_delay(self):
+        """Get time until requests can be delivered, None if none queued."""
+        with self._queue_lock:
+            delay = self._outgoing_queue.next_delay(exclude=self._in_flight)
+        if delay is None or self._breaker.available():
+            return delay
+        return max(delay, self._breaker.retry_after())
+
+    def _complete_batch(self, batch, failed):
+        """Reschedule failed requests and record delivered ones."""
+        with self._queue_lock:
+            dead = self._outgoing_queue.reschedule(failed) if failed else []
+            self._release_group(batch)
+        self._queue_changed()
+        self._delivered.inc(len(batch) - len(failed))
+        if failed:
+            self._retries.inc(len(failed) - len(dead))
+            self._dead.inc(len(dead))
+        if self._journal is not None:
+            failed_idents = {request.ident for request in failed}
+            self._journal.ack(
+                [
+                    request.ident
+                    for request in batch
+                    if request.ident not in failed_idents
+                ]
+                + [request.ident for request in dead]
+            )
+
+    @staticmethod
+    def _batch_data(batch):
+        """Get POST data for a batch of requests."""
+        return {"batch": json.dumps([request.data for request in batch])}
+
+    @staticmethod
+    def _failed_requests(batch, result):
+        """Get failed requests from the result of a delivery.
+
+        The batch endpoint may report per-request results in "results", in
+        the same order as the batch.
+        """
+        if "status" not in result or result["status"] != "ok":
+            return batch
+        if len(batch) == 1:
+            return []
+        results = result.get("results")
+        if results is None:
+            return []
+        failed = [
+            request
+            for request, request_result in zip(batch, results)
+            if not isinstance(request_result, dict)
+            or request_result.get("status") != "ok"
+        ]
+        # requests without a result were not processed
+        failed.extend(batch[len(results) :])
+        return failed
+
+    @property
+    def queue_length(self):
+        """Get number of queued requests."""
+        return len(self._outgoing_queue)
+
+    def lane_stats(self):
+        """Get queued request count and oldest request age per group."""
+        with self._queue_lock:
+            return self._outgoing_queue.lane_stats()
+
+    @property
+    def dead_letters(self):
+        """Get requests that were given up on."""
+        return list(self._outgoing_queue.dead_letters)
+
+    def pop_dead_letters(self):
+        """Get and forget requests that were given up on."""
+        with self._queue_lock:
+            dead_letters = self._outgoing_queue.dead_letters
+            self._outgoing_queue.dead_letters = []
+        return dead_letters
+
+
+class ChainballCentralAPI(CentralAPIBase):
+    """Central API."""
+
+    def __init__(
+        self,
+        cbserver_addr,
+        cbserver_key=None,
+        pool_size=4,
+        retries=2,
+        health_interval=5.0,
+        **kwargs,
+    ):
+        """Initialize.
+
+        Requests go through a persistent session keeping up to pool_size
+        connections alive per host. Connection errors and gateway errors
+        on idempotent requests are retried up to retries times by the
+        transport adapter, timeouts are not. Server liveness is cached
+        for health_interval seconds. Other arguments are passed to
+        CentralAPIBase.
+        """
+        super().__init__(cbserver_addr, cbserver_key, **kwargs)
+        self._worker = None
+        self._worker_stop = False
+        self._session = self._create_session(pool_size, retries)
+        self._health_interval = health_interval
+        # last probe result and when it was made
+        self._health = None
+        self._health_probe = None
+        self._health_stop = threading.Event()
+
+    def _create_session(self, pool_size, retries):
+        """Create pooled HTTP session."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=_Retry(
+                total=retries,
+                backoff_factor=0.1,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Authorization"] = f"Api-Key {self._key}"
+        return session
+
+    def close(self):
+        """Stop delivery and close session and its pooled connections."""
+        self.stop_worker()
+        self.stop_health_probe()
+        self._session.close()
+        if self._journal is not None:
+            self._journal.close()
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context."""
+        self.close()
+
     def process_queue(self, single=False):
-        """Process outgoing queue."""
-        while True:
+        """Process outgoing queue.
+
+        Delivers queued requests until the queue is empty or the next
+        request is not due yet. Delivery stops while the circuit breaker
+        is open.
+        """
+        while self._breaker.available():
+            batch = self._take_batch()
+            if not batch:
+                break
             try:
-                data, sub_api, path, retry = self._outgoing_queue.popleft()
-                result = self._central_api_post(
-                    data=data, sub_api=sub_api, path=path
-                )
-                if "status" not in result or result["status"] != "ok":
-                    raise CBCentralAPIError()
-            except IndexError:
+                failed = self._deliver(batch)
+            except CBCentralAPIUnavailable:
+                self._restore_batch(batch)
                 break
-            except (CBCentralAPITimeout, CBCentralAPIError):
-                # retry
-                if retry:
-                    self._outgoing_queue.appendleft(
-                        (data, sub_api, path, True)
-                    )
+            except BaseException:
+                self._restore_batch(batch)
+                raise
+            self._complete_batch(batch, failed)
             if single:
                 break
 
-    def central_api_get(self, sub_api=None, path=None, timeout=10):
-        """Make a GET request."""
+    def _deliver(self, batch):
+        """Deliver requests, return failed requests."""
+        head = batch[0]
+        if len(batch) == 1:
+            data, path = head.data, head.path
+        else:
+            data, path = self._batch_data(batch), head.batch_path
+        try:
+            result = self._central_api_post(
+                data=data, sub_api=head.sub_api, path=path
+            )
+        except CBCentralAPIUnavailable:
+            raise
+        except CBCentralAPIError:
+            return batch
+        return self._failed_requests(batch, result)
+
+    def start_worker(self):
+        """Start delivering queued requests from a background thread."""
+        if self._worker is not None:
+            return
+        self._worker_stop = False
+        self._worker = threading.Thread(
+            target=self._worker_loop, name="cbcentral-outgoing", daemon=True
+        )
+        self._worker.start()
+
+    def stop_worker(self, timeout=None):
+        """Stop background delivery thread."""
+        if self._worker is None:
+            return
+        with self._queue_lock:
+            self._worker_stop = True
+            self._queue_lock.notify_all()
+        self._worker.join(timeout)
+        self._worker = None
 
+    def _worker_loop(self):
+        """Deliver requests as they become due."""
+        while True:
+            failed = False
+            try:
+                self.process_queue()
+            except Exception:
+                API_LOGGER.exception("failed to process outgoing queue")
+                failed = True
+            with self._queue_lock:
+                if self._worker_stop:
+                    break
+                delay = self._delivery_delay()
+                if failed and delay is not None:
+                    # do not retry the failing delivery right away
+                    delay = max(delay, WORKER_ERROR_DELAY)
+                self._queue_lock.wait(delay)
+                if self._worker_stop:
+                    break
+
+    def central_api_get(
+        self, sub_api=None, path=None, timeout=10, conditional=False
+    ):
+        """Make a GET request.
+
+        If conditional is set, validators from the last response for the
+        same URL are sent and None is returned if it was not modified.
+        """
+
+        self._check_breaker("GET")
         # do not use access token for now
         # build request
-        get_url = self._address
-        if sub_api is not None:
-            get_url = posixpath.join(get_url, sub_api)
-
-        if path is not None:
-            get_url = posixpath.join(get_url, path)
+        get_url = self._build_url(sub_api, path)
+        headers = self._conditional_headers(get_url) if conditional else {}
 
         # perform request (blocking)
+        start = time.perf_counter()
         try:
-            result = requests.get(
-                get_url,
-                timeout=timeout,
-                headers={"Authorization": f"Api-Key {self._key}"},
-            )
+            with tracing.span("api.get", url=get_url) as span:
+                result = self._session.get(
+                    get_url, timeout=timeout, headers=headers
+                )
+                span.set(status=result.status_code)
         except Timeout:
+            self._observe_request("GET", sub_api, path, start, "timeout")
             raise CBCentralAPITimeout("GET timed out.")
         except ConnectionError:
+            self._observe_request("GET", sub_api, path, start, "connection")
             raise CBCentralAPIError("GET failed")
+        self._observe_request(
+            "GET", sub_api, path, start, status=result.status_code
+        )
+        if conditional and result.status_code == 304:
+            return None
         if result.status_code != 200:
             raise CBCentralAPIError(
                 "error querying central API: error {}".format(
                     result.status_code
                 )
             )
-        return result.json()
+        with tracing.span("api.parse", url=get_url):
+            try:
+                data = result.json()
+            except ValueError:
+                # e.g. a captive portal page
+                raise CBCentralAPIError("invalid response from central API")
+        if conditional:
+            self._store_validators(get_url, result.headers)
+        return data
+
+    def central_api_stream(
+        self, sub_api=None, path=None, timeout=10, chunk_size=65536
+    ):
+        """Make a GET request, yielding the response body in chunks."""
+        self._check_breaker("GET")
+        get_url = self._build_url(sub_api, path)
 
-    def push_post_request(self, data, sub_api=None, path=None, retry=True):
-        """Push post request into queue."""
-        self._outgoing_queue.append((data, sub_api, path, retry))
+        start = time.perf_counter()
+        observed = False
+        try:
+            with self._session.get(
+                get_url, timeout=timeout, stream=True
+            ) as result:
+                # latency until the response headers
+                self._observe_request(
+                    "GET", sub_api, path, start, status=result.status_code
+                )
+                observed = True
+                if result.status_code != 200:
+                    raise CBCentralAPIError(
+                        "error querying central API: error {}".format(
+                            result.status_code
+                        )
+                    )
+                yield from result.iter_content(chunk_size)
+        except Timeout:
+            if not observed:
+                self._observe_request("GET", sub_api, path, start, "timeout")
+            raise CBCentralAPITimeout("GET timed out.")
+        except (ConnectionError, ChunkedEncodingError):
+            if not observed:
+                self._observe_request(
+                    "GET", sub_api, path, start, "connection"
+                )
+            raise CBCentralAPIError("GET failed")
 
     def _central_api_post(self, data, sub_api=None, path=None, timeout=10):
         """Make a POST request."""
-        get_url = self._address
-        if sub_api is not None:
-            get_url = posixpath.join(get_url, sub_api)
-
-        if path is not None:
-            get_url = posixpath.join(get_url, path)
+        self._check_breaker("POST")
+        get_url = self._build_url(sub_api, path)
 
+        start = time.perf_counter()
         try:
-            result = requests.post(
-                get_url,
-                timeout=timeout,
-                headers={"Authorization": f"Api-Key {self._key}"},
-                data=data,
-            )
+            with tracing.span("api.post", url=get_url) as span:
+                result = self._session.post(
+                    get_url, timeout=timeout, data=data
+                )
+                span.set(status=result.status_code)
         except Timeout:
+            self._observe_request("POST", sub_api, path, start, "timeout")
             raise CBCentralAPITimeout("POST timed out")
         except ConnectionError:
+            self._observe_request("POST", sub_api, path, start, "connection")
             raise CBCentralAPIError("POST failed")
+        self._observe_request(
+            "POST", sub_api, path, start, status=result.status_code
+        )
 
         if result.status_code != 200:
             raise CBCentralAPIError(
                 "error while doing POST: error {}".format(result.status_code)
             )
 
-        return result.json()
+        with tracing.span("api.parse", url=get_url):
+            try:
+                return result.json()
+            except ValueError:
+                raise CBCentralAPIError("invalid response to POST")
 
-    def central_server_alive(self, timeout=1):
-        """Check if server is alive."""
+    def probe(self, timeout=1):
+        """Check if server is alive with a HEAD request, cache the result.
+
+        The outcome is recorded by the circuit breaker, so a successful
+        probe closes it.
+        """
         try:
-            requests.get(self._addr, timeout=timeout)
+            with tracing.span("api.probe", url=self._address) as span:
+                result = self._session.head(
+                    self._address, timeout=timeout, allow_redirects=False
+                )
+                span.set(status=result.status_code)
         except (Timeout, ConnectionError):
+            alive = False
+        else:
+            # any other response, even an error, comes from the server
+            alive = result.status_code not in (502, 503, 504)
+        if alive:
+            self._breaker.record_success()
+        else:
+            self._breaker.record_failure()
+        self._health = (alive, time.monotonic())
+        return alive
+
+    def central_server_alive(self, timeout=1):
+        """Check if server is alive.
+
+        Returns False without contacting the server while the circuit
+        breaker is open, and the last probe result if it is recent.
+        """
+        if not self._breaker.available():
             return False
+        health = self._health
+        if (
+            health is not None
+            and time.monotonic() - health[1] < self._health_interval
+        ):
+            return health[0]
+        return self.probe(timeout)
+
+    def start_health_probe(self):
+        """Start probing the server every health_interval seconds."""
+        if self._health_probe is not None:
+            return
+        self._health_stop.clear()
+        self._health_probe = threading.Thread(
+            target=self._health_loop, name="cbcentral-health", daemon=True
+        )
+        self._health_probe.start()
+
+    def stop_health_probe(self, timeout=None):
+        """Stop background probe thread."""
+        if self._health_probe is None:
+            return
+        self._health_stop.set()
+        self._health_probe.join(timeout)
+        self._health_probe = None
 
-        return True
+    def _health_loop(self):
+        """Probe server until stopped."""
+        while not self._health_stop.is_set():
+            alive = self.probe()
+            if alive and self.queue_length:
+                # the breaker may have closed, wake up delivery
+                with self._queue_lock:
+                    self._queue_lock.notify_all()
+            self._health_stop.wait(self._health_interval)
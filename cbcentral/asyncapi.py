@@ -0,0 +1,296 @@
+"""Server API access from asyncio.
+
+Requires aiohttp (install the "async" extra).
+"""
+
+import asyncio
+import time
+
+import aiohttp
+
+from cbcentral import tracing
+from cbcentral.api import (
+    API_LOGGER,
+    CentralAPIBase,
+    CBCentralAPIError,
+    CBCentralAPITimeout,
+    CBCentralAPIUnavailable,
+)
+
+
+class AsyncChainballCentralAPI(CentralAPIBase):
+    """Central API for asyncio.
+
+    Must be used from a single event loop. Requests of different groups
+    are delivered concurrently, up to pool_size connections.
+    """
+
+    def __init__(
+        self, cbserver_addr, cbserver_key=None, pool_size=4, **kwargs
+    ):
+        """Initialize.
+
+        Other arguments are passed to CentralAPIBase.
+        """
+        super().__init__(cbserver_addr, cbserver_key, **kwargs)
+        self._pool_size = pool_size
+        self._session = None
+        self._worker = None
+        self._queue_event = asyncio.Event()
+
+    def _get_session(self):
+        """Get HTTP session, creating it in the running loop if needed."""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                headers={"Authorization": f"Api-Key {self._key}"},
+            )
+        return self._session
+
+    async def close(self):
+        """Stop delivery and close session."""
+        await self.stop_worker()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._journal is not None:
+            self._journal.close()
+
+    async def __aenter__(self):
+        """Enter context."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit context."""
+        await self.close()
+
+    def _queue_changed(self):
+        """Wake up worker."""
+        self._queue_event.set()
+
+    async def process_queue(self, single=False):
+        """Process outgoing queue.
+
+        Delivers queued requests until the queue is empty or the next
+        request is not due yet, with one delivery in flight per group.
+        Delivery stops while the circuit breaker is open.
+        """
+        in_flight = {}
+        while True:
+            while self._breaker.available():
+                batch = self._take_batch()
+                if not batch:
+                    break
+                in_flight[batch[0].group] = asyncio.ensure_future(
+                    self._deliver(batch)
+                )
+                if single:
+                    break
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(
+                in_flight.values(), return_when=asyncio.FIRST_COMPLETED
+            )
+            for group, task in list(in_flight.items()):
+                if task in done:
+                    del in_flight[group]
+            if single and not in_flight:
+                break
+
+    async def _deliver(self, batch):
+        """Deliver requests."""
+        head = batch[0]
+        if len(batch) == 1:
+            data, path = head.data, head.path
+        else:
+            data, path = self._batch_data(batch), head.batch_path
+        # every path completes or restores the batch, releasing its group
+        try:
+            result = await self._central_api_post(
+                data=data, sub_api=head.sub_api, path=path
+            )
+            failed = self._failed_requests(batch, result)
+        except CBCentralAPIUnavailable:
+            self._restore_batch(batch)
+            return
+        except asyncio.CancelledError:
+            self._restore_batch(batch)
+            raise
+        except CBCentralAPIError:
+            failed = batch
+        except Exception:
+            API_LOGGER.exception("failed to deliver queued requests")
+            failed = batch
+        self._complete_batch(batch, failed)
+
+    def start_worker(self):
+        """Start delivering queued requests from a task."""
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._worker_loop())
+
+    async def stop_worker(self):
+        """Stop delivery task."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _worker_loop(self):
+        """Deliver requests as they become due."""
+        while True:
+            self._queue_event.clear()
+            await self.process_queue()
+            try:
+                await asyncio.wait_for(
+                    self._queue_event.wait(),
+                    self._delivery_delay(),
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def central_api_get(
+        self, sub_api=None, path=None, timeout=10, conditional=False
+    ):
+        """Make a GET request.
+
+        If conditional is set, validators from the last response for the
+        same URL are sent and None is returned if it was not modified.
+        """
+        self._check_breaker("GET")
+        get_url = self._build_url(sub_api, path)
+        headers = self._conditional_headers(get_url) if conditional else {}
+
+        start = time.perf_counter()
+        observed = False
+        try:
+            with tracing.span("api.get", url=get_url) as span:
+                response = await self._get_session().get(
+                    get_url,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    headers=headers,
+                )
+                span.set(status=response.status)
+            async with response as result:
+                if conditional and result.status == 304:
+                    self._observe_request("GET", sub_api, path, start)
+                    return None
+                if result.status != 200:
+                    self._observe_request(
+                        "GET", sub_api, path, start, status=result.status
+                    )
+                    observed = True
+                    raise CBCentralAPIError(
+                        "error querying central API: error {}".format(
+                            result.status
+                        )
+                    )
+                self._observe_request("GET", sub_api, path, start)
+                observed = True
+                with tracing.span("api.parse", url=get_url):
+                    try:
+                        data = await result.json(content_type=None)
+                    except ValueError:
+                        # e.g. a captive portal page
+                        raise CBCentralAPIError(
+                            "invalid response from central API"
+                        )
+        except asyncio.TimeoutError:
+            if not observed:
+                self._observe_request("GET", sub_api, path, start, "timeout")
+            raise CBCentralAPITimeout("GET timed out.")
+        except aiohttp.ClientError:
+            if not observed:
+                self._observe_request(
+                    "GET", sub_api, path, start, "connection"
+                )
+            raise CBCentralAPIError("GET failed")
+        if conditional:
+            self._store_validators(get_url, result.headers)
+        return data
+
+    async def central_api_stream(
+        self, sub_api=None, path=None, timeout=10, chunk_size=65536
+    ):
+        """Make a GET request, yielding the response body in chunks."""
+        self._check_breaker("GET")
+        get_url = self._build_url(sub_api, path)
+
+        start = time.perf_counter()
+        observed = False
+        try:
+            async with self._get_session().get(
+                get_url, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as result:
+                # latency until the response headers
+                self._observe_request(
+                    "GET", sub_api, path, start, status=result.status
+                )
+                observed = True
+                if result.status != 200:
+                    raise CBCentralAPIError(
+                        "error querying central API: error {}".format(
+                            result.status
+                        )
+                    )
+                async for chunk in result.content.iter_chunked(chunk_size):
+                    yield chunk
+        except asyncio.TimeoutError:
+            if not observed:
+                self._observe_request("GET", sub_api, path, start, "timeout")
+            raise CBCentralAPITimeout("GET timed out.")
+        except aiohttp.ClientError:
+            if not observed:
+                self._observe_request(
+                    "GET", sub_api, path, start, "connection"
+                )
+            raise CBCentralAPIError("GET failed")
+
+    async def _central_api_post(
+        self, data, sub_api=None, path=None, timeout=10
+    ):
+        """Make a POST request."""
+        self._check_breaker("POST")
+        get_url = self._build_url(sub_api, path)
+
+        start = time.perf_counter()
+        observed = False
+        try:
+            with tracing.span("api.post", url=get_url) as span:
+                response = await self._get_session().post(
+                    get_url,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    data=data,
+                )
+                span.set(status=response.status)
+            async with response as result:
+                if result.status != 200:
+                    self._observe_request(
+                        "POST", sub_api, path, start, status=result.status
+                    )
+                    observed = True
+                    raise CBCentralAPIError(
+                        "error while doing POST: error {}".format(
+                            result.status
+                        )
+                    )
+                self._observe_request("POST", sub_api, path, start)
+                observed = True
+                with tracing.span("api.parse", url=get_url):
+                    try:
+                        return await result.json(content_type=None)
+                    except ValueError:
+                        raise CBCentralAPIError("invalid response to POST")
+        except asyncio.TimeoutError:
+            if not observed:
+                self._observe_request("POST", sub_api, path, start, "timeout")
+            raise CBCentralAPITimeout("POST timed out")
+        except aiohttp.ClientError:
+            if not observed:
+                self._observe_request(
+                    "POST", sub_api, path, start, "connection"
+                )
+            raise CBCentralAPIError("POST failed")
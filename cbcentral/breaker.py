@@ -0,0 +1,114 @@
+"""Circuit breaker for the central server.
+
+The breaker is closed while requests succeed. After failure_threshold
+consecutive failures it opens and requests are refused without
+contacting the server. Once reset_timeout seconds have passed, it is
+half-open: a single trial request is let through, which closes the
+breaker if it succeeds and opens it again if it fails.
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Closed, open and half-open states tracking server failures."""
+
+    def __init__(
+        self, failure_threshold=5, reset_timeout=10.0, clock=time.monotonic
+    ):
+        """Initialize."""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened = 0.0
+        # start of the trial request while half-open, None if not started
+        self._trial = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Get state."""
+        with self._lock:
+            if (
+                self._state == OPEN
+                and self._clock() - self._opened >= self._reset_timeout
+            ):
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Get whether a request may be made now.
+
+        While half-open, only one trial request is allowed until its
+        outcome is recorded, or until reset_timeout has passed without
+        one.
+        """
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            now = self._clock()
+            if self._state == OPEN:
+                if now - self._opened < self._reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._trial = None
+            if self._state == HALF_OPEN:
+                if (
+                    self._trial is not None
+                    and now - self._trial < self._reset_timeout
+                ):
+                    return False
+                self._trial = now
+            return True
+
+    def available(self) -> bool:
+        """Get whether a request would be allowed, without starting one."""
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            now = self._clock()
+            if self._state == OPEN:
+                return now - self._opened >= self._reset_timeout
+            return (
+                self._trial is None or now - self._trial >= self._reset_timeout
+            )
+
+    def retry_after(self) -> float:
+        """Get time until a request would be allowed."""
+        with self._lock:
+            now = self._clock()
+            if self._state == OPEN:
+                since = self._opened
+            elif self._state == HALF_OPEN and self._trial is not None:
+                since = self._trial
+            else:
+                return 0.0
+            return max(0.0, since + self._reset_timeout - now)
+
+    def record_success(self):
+        """Record successful request."""
+        if self._state == CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial = None
+
+    def record_failure(self):
+        """Record failed request."""
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == HALF_OPEN
+                or self._failures >= self._failure_threshold
+            ):
+                self._state = OPEN
+                self._opened = self._clock()
+                self._trial = None
@@ -0,0 +1,254 @@
+"""Durable outgoing request journal."""
+
+import json
+import os
+import threading
+import zlib
+from logging import getLogger
+
+JOURNAL_LOGGER = getLogger("cbcentral.journal")
+
+
+class JournalError(Exception):
+    """Journal error."""
+
+
+def encode_record(record):
+    """Encode record as a checksummed line."""
+    payload = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode()):08x} {payload}\n"
+
+
+def decode_record(line):
+    """Decode line, None if it is torn or corrupted."""
+    if not line.endswith("\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload.encode()):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class OutgoingJournal:
+    """Append-only log of queued and delivered requests.
+
+    Queued requests and acknowledgements are appended to the current
+    segment file as checksummed JSON lines. Writes are made durable in
+    groups: a background thread calls fsync at most every sync_interval
+    seconds, so pushing an event only costs a buffered write. Once the
+    current segment grows over segment_size bytes, or twice the size it
+    had after the last compaction, the background thread writes the
+    requests that are still pending to a new segment and removes the old
+    ones once it is durable.
+    """
+
+    def __init__(self, path, sync_interval=0.05, segment_size=1 << 20):
+        """Initialize."""
+        self._path = path
+        self._sync_interval = sync_interval
+        self._segment_size = segment_size
+        self._lock = threading.Condition()
+        self._pending = {}
+        self._segment = None
+        self._segment_number = 0
+        self._compacted_size = 0
+        self._dirty = False
+        self._compact_due = False
+        self._closed = False
+
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            raise JournalError("cannot create journal directory")
+
+        self._load()
+        self._compact()
+        self._syncer = threading.Thread(
+            target=self._sync_loop, name="cbcentral-journal", daemon=True
+        )
+        self._syncer.start()
+
+    def _segments(self):
+        """Get segment numbers present on disk, in order."""
+        numbers = []
+        for file_name in os.listdir(self._path):
+            if file_name.startswith("segment-") and file_name.endswith(".log"):
+                try:
+                    numbers.append(int(file_name[8:-4]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _segment_path(self, number):
+        """Get segment file path."""
+        return os.path.join(self._path, f"segment-{number:08d}.log")
+
+    def _load(self):
+        """Replay segments."""
+        for number in self._segments():
+            self._segment_number = max(self._segment_number, number)
+            try:
+                with open(self._segment_path(number), "r") as segment:
+                    for line in segment:
+                        record = decode_record(line)
+                        if record is None:
+                            # torn write, nothing after it is valid
+                            JOURNAL_LOGGER.warning(
+                                "discarding corrupted journal tail"
+                            )
+                            break
+                        if record["op"] == "add":
+                            self._pending[record["id"]] = record["request"]
+                        elif record["op"] == "ack":
+                            for ident in record["ids"]:
+                                self._pending.pop(ident, None)
+            except OSError:
+                raise JournalError("cannot read journal")
+
+    def _rotate(self):
+        """Start a segment holding the pending requests, must hold lock.
+
+        Returns the number of the new segment. Older segments are kept
+        until it is durable.
+        """
+        number = self._segment_number + 1
+        new_path = self._segment_path(number)
+        segment = open(new_path, "w")
+        try:
+            for ident, request in self._pending.items():
+                segment.write(
+                    encode_record(
+                        {"op": "add", "id": ident, "request": request}
+                    )
+                )
+            segment.flush()
+        except OSError:
+            segment.close()
+            os.remove(new_path)
+            raise
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = segment
+        self._segment_number = number
+        self._compacted_size = segment.tell()
+        return number
+
+    def _sync_directory(self):
+        """Make creation and removal of segments durable."""
+        descriptor = os.open(self._path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _remove_segments(self, number):
+        """Remove segments before a durable one."""
+        self._sync_directory()
+        for old_number in self._segments():
+            if old_number < number:
+                os.remove(self._segment_path(old_number))
+        self._sync_directory()
+
+    def _compact(self):
+        """Write pending requests into a fresh segment, drop old ones."""
+        try:
+            number = self._rotate()
+            os.fsync(self._segment.fileno())
+            self._remove_segments(number)
+        except OSError:
+            raise JournalError("cannot compact journal")
+
+    def _write(self, record):
+        """Append record, must hold lock."""
+        if self._closed:
+            raise JournalError("journal is closed")
+        self._segment.write(encode_record(record))
+        self._segment.flush()
+        # pending requests alone may outgrow the segment size
+        if self._segment.tell() > max(
+            self._segment_size, 2 * self._compacted_size
+        ):
+            self._compact_due = True
+        self._dirty = True
+        self._lock.notify()
+
+    def _sync_loop(self):
+        """Flush writes to disk in groups."""
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    break
+                # let more writes join this group
+                self._lock.wait(self._sync_interval)
+                if self._closed:
+                    break
+                self._dirty = False
+                compacted = None
+                if self._compact_due:
+                    self._compact_due = False
+                    try:
+                        compacted = self._rotate()
+                    except OSError:
+                        JOURNAL_LOGGER.error("failed to compact journal")
+                # the segment may be replaced while syncing
+                descriptor = os.dup(self._segment.fileno())
+            try:
+                os.fsync(descriptor)
+                if compacted is not None:
+                    self._remove_segments(compacted)
+            except OSError:
+                JOURNAL_LOGGER.error("failed to sync journal")
+            finally:
+                os.close(descriptor)
+
+    def _sync(self):
+        """Make writes durable, must hold lock."""
+        if self._dirty:
+            try:
+                os.fsync(self._segment.fileno())
+            except OSError:
+                JOURNAL_LOGGER.error("failed to sync journal")
+        self._dirty = False
+
+    @property
+    def pending(self):
+        """Get pending requests by identifier, in order."""
+        with self._lock:
+            return dict(self._pending)
+
+    def append(self, ident, request):
+        """Record queued request."""
+        with self._lock:
+            self._pending[ident] = request
+            self._write({"op": "add", "id": ident, "request": request})
+
+    def ack(self, idents):
+        """Record requests as done."""
+        with self._lock:
+            idents = [ident for ident in idents if ident in self._pending]
+            if not idents:
+                return
+            for ident in idents:
+                del self._pending[ident]
+            self._write({"op": "ack", "ids": idents})
+
+    def sync(self):
+        """Make all writes durable now."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Sync and close journal."""
+        with self._lock:
+            if self._closed:
+                return
+            self._sync()
+            self._closed = True
+            self._segment.close()
+            self._lock.notify_all()
+        self._syncer.join()
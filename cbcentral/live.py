@@ -3,6 +3,7 @@
 import json
 
 from cbcentral.api import ChainballCentralAPI
+from cbcentral.outgoing import PRIORITY_HIGH
 
 
 def push_event(handler: ChainballCentralAPI, game_uuid, evt_type, evt_desc):
@@ -10,7 +11,11 @@ def push_event(handler: ChainballCentralAPI, game_uuid, evt_type, evt_desc):
     post_data = {"evt_type": evt_type, "evt_data": evt_desc}
     data_dump = {"payload": json.dumps(post_data)}
     handler.push_post_request(
-        data_dump, sub_api="api", path=f"games/{game_uuid}/push_event/"
+        data_dump,
+        sub_api="api",
+        path=f"games/{game_uuid}/push_event/",
+        group=game_uuid,
+        batch_path=f"games/{game_uuid}/push_events/",
     )
 
 
@@ -22,12 +27,16 @@ def game_start(
     post_data = {"start_time": start_time, "player_order": order}
     data_dump = {"payload": json.dumps(post_data)}
     handler.push_post_request(
-        data_dump, sub_api="api", path=f"games/{game_uuid}/start_game/"
+        data_dump,
+        sub_api="api",
+        path=f"games/{game_uuid}/start_game/",
+        group=game_uuid,
+        priority=PRIORITY_HIGH,
     )
 
 
 def game_end(
-    handler: ChainballCentralAPI(),
+    handler: ChainballCentralAPI,
     game_uuid,
     reason,
     winner,
@@ -43,5 +52,9 @@ def game_end(
     }
     data_dump = {"payload": json.dumps(post_data)}
     handler.push_post_request(
-        data_dump, sub_api="api", path=f"games/{game_uuid}/stop_game/"
+        data_dump,
+        sub_api="api",
+        path=f"games/{game_uuid}/stop_game/",
+        group=game_uuid,
+        priority=PRIORITY_HIGH,
     )
@@ -3,14 +3,17 @@
 from cbcentral.registry import LocalRegistry
 from cbcentral.registry.entry import LocalRegistryEntry
 from cbcentral.util import id_from_url
-from cbcentral.queries import query_announcements
+from cbcentral.queries import query_announcements, query_announcements_async
 
 
 class AnnouncementEntry(LocalRegistryEntry):
     """Announcement."""
 
+    __slots__ = ("_identifier", "_players", "_court")
+
     _index = "identifier"
     _fields = ["identifier", "players", "court"]
+    _secondary = ["players", "court"]
 
     def __init__(self, identifier, players, court, **kwargs):
         """Initialize."""
@@ -41,14 +44,29 @@ class AnnouncementEntry(LocalRegistryEntry):
 class LocalAnnounceRegistry(LocalRegistry):
     """Get announcements from server."""
 
-    def __init__(self, db_path):
-        """Initialize."""
-        super().__init__("announce_registry", AnnouncementEntry, db_path)
+    _dependencies = ("player_registry", "game_registry")
+    _upstream_path = ("api", "announce")
+
+    def __init__(self, db_path, **kwargs):
+        """Initialize.
+
+        Other arguments are passed to LocalRegistry.
+        """
+        super().__init__(
+            "announce_registry", AnnouncementEntry, db_path, **kwargs
+        )
+
+    def fetch_upstream(self, api_obj):
+        """Get announcements from central server."""
+        return query_announcements(api_obj, conditional=True)
+
+    async def fetch_upstream_async(self, api_obj):
+        """Get announcements from central server using asyncio."""
+        return await query_announcements_async(api_obj, conditional=True)
 
-    def update_registry(self, api_obj):
-        """Update registry."""
-        upstream_announcements = query_announcements(api_obj)
-        self.build_registry(upstream_announcements)
+    def apply_upstream(self, contents, api_obj):
+        """Apply announcements and save."""
+        self.build_registry(contents)
         self.commit_registry()
 
     # def new_entry(self, content):
@@ -2,13 +2,26 @@
 
 from cbcentral.registry import LocalRegistry
 from cbcentral.registry.entry import LocalRegistryEntry
-from cbcentral.util import id_from_url
-from cbcentral.queries import query_games
+from cbcentral.util import id_from_url, intern_value
+from cbcentral.queries import query_games, query_games_async
 
 
 class GameEntry(LocalRegistryEntry):
     """Game registry entry."""
 
+    __slots__ = (
+        "_identifier",
+        "_sequence",
+        "_description",
+        "_tournament",
+        "_events",
+        "_players",
+        "_duration",
+        "_start_time",
+        "_status",
+        "_court",
+    )
+
     _index = "identifier"
     _fields = [
         "identifier",
@@ -22,6 +35,7 @@ class GameEntry(LocalRegistryEntry):
         "game_status",
         "court",
     ]
+    _secondary = ["tournament", "players", "game_status", "court"]
 
     def __init__(
         self,
@@ -47,7 +61,7 @@ class GameEntry(LocalRegistryEntry):
         self._players = [id_from_url(player) for player in players]
         self._duration = duration
         self._start_time = start_time
-        self._status = game_status
+        self._status = intern_value(game_status)
         if court is None:
             self._court = None
         else:
@@ -117,15 +131,24 @@ class GameEntry(LocalRegistryEntry):
 class LocalGameRegistry(LocalRegistry):
     """Game registry retrieved from server."""
 
-    def __init__(self, db_path):
-        """Initialize."""
-        super().__init__("game_registry", GameEntry, db_path)
+    _dependencies = ("player_registry", "tournament_registry")
+    _upstream_path = ("api", "games")
+
+    def __init__(self, db_path, **kwargs):
+        """Initialize.
+
+        Other arguments are passed to LocalRegistry.
+        """
+        super().__init__("game_registry", GameEntry, db_path, **kwargs)
         self.game_wrapper = None
 
-    def update_registry(self, api_obj):
-        """Update registry."""
-        upstream_games = query_games(api_obj)
-        self.build_registry(upstream_games)
+    def fetch_upstream(self, api_obj):
+        """Get games from central server."""
+        return query_games(api_obj, conditional=True)
+
+    async def fetch_upstream_async(self, api_obj):
+        """Get games from central server using asyncio."""
+        return await query_games_async(api_obj, conditional=True)
 
     def value_changed(self, entry_index, field_name, old_value, new_value):
         """Value changed callback."""
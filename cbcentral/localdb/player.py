@@ -1,18 +1,36 @@
 """Player registry."""
+
+import asyncio
 import os
-import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from cbcentral.registry.entry import LocalRegistryEntry
 from cbcentral.registry import LocalRegistry
 from cbcentral.localdb import LOCALDB_LOGGER
-from cbcentral.queries import query_players, get_sfx_data
+from cbcentral.queries import (
+    query_players,
+    query_players_async,
+    stream_sfx_data,
+    stream_sfx_data_async,
+)
 from cbcentral.api import CBCentralAPIError
-from cbcentral.util import md5_sum
+from cbcentral import tracing
+from cbcentral.localdb.sfx import SFXDownload, SFXStore
+from cbcentral.util import ChecksumCache, intern_value
+
+SFX_UNCHANGED = "unchanged"
+SFX_UPDATED = "updated"
+SFX_FAILED = "failed"
+
+# errors that fail a single player's SFX update
+SFX_ERRORS = (CBCentralAPIError, OSError, KeyError, TypeError, ValueError)
 
 
 class PlayerEntry(LocalRegistryEntry):
     """Locally cached player description."""
 
+    __slots__ = ("_name", "_dispname", "_username", "_sfx_md5")
+
     _index = "username"
     _fields = ["name", "display_name", "username", "sfx_md5"]
 
@@ -21,7 +39,7 @@ class PlayerEntry(LocalRegistryEntry):
         super().__init__(**kwargs)
         self._name = name
         self._dispname = display_name
-        self._username = username
+        self._username = intern_value(username)
         self._sfx_md5 = sfx_md5
 
     @property
@@ -48,72 +66,373 @@ class PlayerEntry(LocalRegistryEntry):
 class LocalPlayerRegistry(LocalRegistry):
     """Local player registry."""
 
-    def __init__(self, db_path, sfx_path=None):
-        super().__init__("player_registry", PlayerEntry, db_path)
+    _upstream_path = ("api", "players")
+
+    def __init__(
+        self,
+        db_path,
+        sfx_path=None,
+        sfx_workers=4,
+        sfx_dedup=False,
+        **kwargs,
+    ):
+        """Initialize.
+
+        SFX data of up to sfx_workers players is checked and downloaded
+        at the same time.
+
+        If sfx_dedup is set, clips are kept once per MD5 sum in a
+        content-addressed store under sfx_path and player files link to
+        them. Clips already in the store are not downloaded again, and
+        clips no longer used by any player are removed.
+
+        Other arguments are passed to LocalRegistry.
+        """
+        super().__init__("player_registry", PlayerEntry, db_path, **kwargs)
         self._sfx_path = sfx_path
+        self._sfx_checksums = ChecksumCache(
+            os.path.join(db_path, "sfx_checksums.json")
+        )
+        self._sfx_store = None
+        if sfx_dedup and sfx_path is not None:
+            self._sfx_store = SFXStore(
+                os.path.join(sfx_path, ".store"), self._sfx_checksums
+            )
+        self._sfx_workers = sfx_workers
+        self._sfx_report = None
+        # called with (done, total, username, status) as players are checked
+        self.sfx_progress = None
 
         # build registry
         LOCALDB_LOGGER.info("local player registry loaded")
 
-    def update_registry(self, api_obj):
-        """Update registry with information from central server."""
+    def fetch_upstream(self, api_obj):
+        """Get players from central server."""
+        LOCALDB_LOGGER.info("updating player registry from central server")
+        return query_players(api_obj, conditional=True)
+
+    async def fetch_upstream_async(self, api_obj):
+        """Get players from central server using asyncio."""
         LOCALDB_LOGGER.info("updating player registry from central server")
-        upstream_players = query_players(api_obj)
-        self.build_registry(upstream_players)
+        return await query_players_async(api_obj, conditional=True)
+
+    def apply_upstream(self, contents, api_obj):
+        """Apply players and download SFX updates."""
+        self.build_registry(contents)
+        self._check_for_sfx_updates(api_obj)
+
+    async def apply_upstream_async(self, contents, api_obj):
+        """Apply players and download SFX updates using asyncio."""
+        await asyncio.to_thread(self.build_registry, contents)
+        await self._check_for_sfx_updates_async(api_obj)
+
+    def apply_unchanged(self, api_obj):
+        """Retry failed SFX downloads and restore missing SFX data."""
+        super().apply_unchanged(api_obj)
         self._check_for_sfx_updates(api_obj)
 
-    @staticmethod
-    def _write_sfx_b64_data(data, dest):
-        """Decode and write data."""
-        decoded_data = base64.b64decode(data)
+    async def apply_unchanged_async(self, api_obj):
+        """Retry failed SFX downloads using asyncio."""
+        await asyncio.to_thread(super().apply_unchanged, api_obj)
+        await self._check_for_sfx_updates_async(api_obj)
+
+    def _sfx_needs_update(self, player):
+        """Check if local SFX data of player is missing or outdated."""
+        player_sfx_path = os.path.join(self.sfx_path, player.username)
+        if not os.path.exists(player_sfx_path):
+            # SFX data has not been downloaded
+            return True
         try:
-            with open(dest, "wb") as sfx_data_file:
-                sfx_data_file.write(decoded_data)
+            cur_md5sum = self._sfx_checksums.md5_sum(player_sfx_path)
         except OSError:
+            LOCALDB_LOGGER.warning("failed to calculate SFX checksum")
             return False
-        return True
+        if cur_md5sum != player.sfx_md5:
+            LOCALDB_LOGGER.info(
+                f"updating SFX data for player '{player.username}'"
+            )
+            return True
+        return False
+
+    def _finish_sfx_download(self, player, download, dest):
+        """Commit downloaded SFX data if it is valid."""
+        document = download.finish()
+        if document.get("status") != "ok":
+            LOCALDB_LOGGER.error("failed to retrieve SFX data")
+            return SFX_FAILED
+
+        if not download.found:
+            return SFX_UNCHANGED
+
+        if player.sfx_md5 is not None and download.md5 != player.sfx_md5:
+            LOCALDB_LOGGER.error(
+                f"SFX data for player '{player.username}' does not match "
+                "checksum"
+            )
+            return SFX_FAILED
+
+        # write
+        LOCALDB_LOGGER.info(f"writing SFX data for player '{player.username}'")
+        if self._sfx_store is not None:
+            self._sfx_store.add(download, download.md5)
+        else:
+            download.commit(dest)
+            self._sfx_checksums.record(dest, download.md5)
+        return SFX_UPDATED
+
+    def _download_sfx(self, player, api_obj, dest):
+        """Download SFX data of a player."""
+        download = SFXDownload(self.sfx_path)
+        try:
+            with tracing.span("sfx.download", player=player.username):
+                for chunk in stream_sfx_data(player.username, api_obj):
+                    download.feed(chunk)
+            with tracing.span("sfx.write", player=player.username):
+                return self._finish_sfx_download(player, download, dest)
+        finally:
+            download.discard()
+
+    async def _download_sfx_async(self, player, api_obj, dest):
+        """Download SFX data of a player using asyncio."""
+        download = SFXDownload(self.sfx_path)
+        try:
+            with tracing.span("sfx.download", player=player.username):
+                async for chunk in stream_sfx_data_async(
+                    player.username, api_obj
+                ):
+                    await asyncio.to_thread(download.feed, chunk)
+            with tracing.span("sfx.write", player=player.username):
+                return await asyncio.to_thread(
+                    self._finish_sfx_download, player, download, dest
+                )
+        finally:
+            download.discard()
+
+    def _update_player_sfx(self, player, api_obj):
+        """Check and download SFX data of a player."""
+        try:
+            if not self._sfx_needs_update(player):
+                return SFX_UNCHANGED
+            return self._download_sfx(
+                player, api_obj, os.path.join(self.sfx_path, player.username)
+            )
+        except SFX_ERRORS:
+            LOCALDB_LOGGER.exception(
+                f"failed to update SFX data for player '{player.username}'"
+            )
+            return SFX_FAILED
+
+    async def _update_player_sfx_async(self, player, api_obj):
+        """Check and download SFX data of a player using asyncio."""
+        try:
+            needs_update = await asyncio.to_thread(
+                self._sfx_needs_update, player
+            )
+            if not needs_update:
+                return SFX_UNCHANGED
+            return await self._download_sfx_async(
+                player, api_obj, os.path.join(self.sfx_path, player.username)
+            )
+        except SFX_ERRORS:
+            LOCALDB_LOGGER.exception(
+                f"failed to update SFX data for player '{player.username}'"
+            )
+            return SFX_FAILED
+
+    def _link_stored_sfx(self, players, status):
+        """Link player files to a stored clip, return status per player."""
+        statuses = {}
+        for player in players:
+            if status == SFX_FAILED:
+                statuses[player.username] = SFX_FAILED
+                continue
+            try:
+                changed = self._sfx_store.link(
+                    player.sfx_md5,
+                    os.path.join(self.sfx_path, player.username),
+                )
+            except SFX_ERRORS:
+                LOCALDB_LOGGER.exception(
+                    f"failed to link SFX data for player '{player.username}'"
+                )
+                statuses[player.username] = SFX_FAILED
+                continue
+            statuses[player.username] = (
+                SFX_UPDATED if changed or status == SFX_UPDATED else status
+            )
+        return statuses
+
+    def _fetch_stored_sfx(self, player, api_obj):
+        """Download a clip into the store unless already stored."""
+        try:
+            if self._sfx_store.has(player.sfx_md5):
+                return SFX_UNCHANGED
+            status = self._download_sfx(player, api_obj, None)
+        except SFX_ERRORS:
+            LOCALDB_LOGGER.exception(
+                f"failed to update SFX data for player '{player.username}'"
+            )
+            return SFX_FAILED
+        if status == SFX_UNCHANGED:
+            # server had no data for the checksum
+            return SFX_FAILED
+        return status
+
+    async def _fetch_stored_sfx_async(self, player, api_obj):
+        """Download a clip into the store using asyncio."""
+        try:
+            if self._sfx_store.has(player.sfx_md5):
+                return SFX_UNCHANGED
+            status = await self._download_sfx_async(player, api_obj, None)
+        except SFX_ERRORS:
+            LOCALDB_LOGGER.exception(
+                f"failed to update SFX data for player '{player.username}'"
+            )
+            return SFX_FAILED
+        if status == SFX_UNCHANGED:
+            return SFX_FAILED
+        return status
+
+    def _update_sfx(self, players, api_obj):
+        """Update SFX data of players sharing a clip."""
+        if self._sfx_store is None:
+            (player,) = players
+            return {player.username: self._update_player_sfx(player, api_obj)}
+        if players[0].sfx_md5 is None:
+            # no clip
+            return {player.username: SFX_UNCHANGED for player in players}
+        status = self._fetch_stored_sfx(players[0], api_obj)
+        return self._link_stored_sfx(players, status)
+
+    async def _update_sfx_async(self, players, api_obj):
+        """Update SFX data of players sharing a clip using asyncio."""
+        if self._sfx_store is None:
+            (player,) = players
+            status = await self._update_player_sfx_async(player, api_obj)
+            return {player.username: status}
+        if players[0].sfx_md5 is None:
+            return {player.username: SFX_UNCHANGED for player in players}
+        status = await self._fetch_stored_sfx_async(players[0], api_obj)
+        return await asyncio.to_thread(self._link_stored_sfx, players, status)
+
+    def _sfx_units(self, players):
+        """Get groups of players whose SFX data is updated together."""
+        if self._sfx_store is None:
+            return [[player] for player in players]
+        units = {}
+        for player in players:
+            units.setdefault(player.sfx_md5, []).append(player)
+        return list(units.values())
+
+    def _new_sfx_report(self, total):
+        """Start SFX report."""
+        self._sfx_report = {
+            "total": total,
+            SFX_UNCHANGED: 0,
+            SFX_UPDATED: 0,
+            SFX_FAILED: 0,
+            "failed_players": [],
+        }
+
+    def _sfx_checked(self, username, status):
+        """Record SFX status of a player."""
+        report = self._sfx_report
+        report[status] += 1
+        if status == SFX_FAILED:
+            report["failed_players"].append(username)
+        if self.sfx_progress is not None:
+            done = (
+                report[SFX_UNCHANGED]
+                + report[SFX_UPDATED]
+                + report[SFX_FAILED]
+            )
+            self.sfx_progress(done, report["total"], username, status)
+
+    def _save_sfx_checksums(self, players):
+        """Save checksums of current players' SFX files."""
+        self._sfx_checksums.prune(
+            [
+                os.path.join(self.sfx_path, player.username)
+                for player in players
+            ]
+        )
+        self._sfx_checksums.save()
+
+    def _collect_sfx(self, players):
+        """Remove stored clips not used by current players."""
+        if self._sfx_store is None:
+            return
+        try:
+            removed = self._sfx_store.collect(
+                {player.sfx_md5 for player in players}
+            )
+        except OSError:
+            LOCALDB_LOGGER.exception("failed to remove unused SFX data")
+            return
+        if removed:
+            LOCALDB_LOGGER.info(f"removed {removed} unused SFX clips")
 
     def _check_for_sfx_updates(self, api_obj):
         """Check for SFX updates."""
         if self.sfx_path is None:
             return
-        for player in self:
-            failed = False
-            player_sfx_path = os.path.join(self.sfx_path, player.username)
-            if os.path.exists(player_sfx_path):
-                download_and_write = False
-                try:
-                    cur_md5sum = md5_sum(player_sfx_path)
-                except OSError:
-                    LOCALDB_LOGGER.warning("failed to calculate SFX checksum")
-                    continue
-                if cur_md5sum != player.sfx_md5:
-                    download_and_write = True
-                    LOCALDB_LOGGER(
-                        f"updating SFX data for player '{player.username}'"
-                    )
-            else:
-                download_and_write = True
-            if download_and_write is True:
-                # SFX data has not been downloaded
-                try:
-                    data = get_sfx_data(player.username, api_obj)
-                except CBCentralAPIError:
-                    failed = True
-                if failed is True or data["status"] != "ok":
-                    LOCALDB_LOGGER.error("failed to retrieve SFX data")
-                    continue
-
-                if data["data"] is not None:
-                    # write
-                    LOCALDB_LOGGER.info(
-                        f"writing SFX data for player '{player.username}'"
-                    )
-                    if (
-                        self._write_sfx_b64_data(data["data"], player_sfx_path)
-                        is False
-                    ):
-                        LOCALDB_LOGGER.error("failed to write SFX data")
+        players = list(self)
+        self._new_sfx_report(len(players))
+        with tracing.span("sfx.check", players=len(players)):
+            with ThreadPoolExecutor(max_workers=self._sfx_workers) as pool:
+                futures = [
+                    pool.submit(self._update_sfx, unit, api_obj)
+                    for unit in self._sfx_units(players)
+                ]
+                for future in as_completed(futures):
+                    for username, status in future.result().items():
+                        self._sfx_checked(username, status)
+        self._save_sfx_checksums(players)
+        with tracing.span("sfx.collect"):
+            self._collect_sfx(players)
+        LOCALDB_LOGGER.info(f"SFX check done: {self._sfx_report}")
+
+    async def _check_for_sfx_updates_async(self, api_obj):
+        """Check for SFX updates using asyncio."""
+        if self.sfx_path is None:
+            return
+        players = list(self)
+        self._new_sfx_report(len(players))
+        semaphore = asyncio.Semaphore(self._sfx_workers)
+
+        async def _update(unit):
+            async with semaphore:
+                statuses = await self._update_sfx_async(unit, api_obj)
+            for username, status in statuses.items():
+                self._sfx_checked(username, status)
+
+        with tracing.span("sfx.check", players=len(players)):
+            await asyncio.gather(
+                *[_update(unit) for unit in self._sfx_units(players)]
+            )
+        self._save_sfx_checksums(players)
+        with tracing.span("sfx.collect"):
+            await asyncio.to_thread(self._collect_sfx, players)
+        LOCALDB_LOGGER.info(f"SFX check done: {self._sfx_report}")
+
+    def sfx_file(self, username):
+        """Get path of a player's SFX data, None if not available."""
+        player = self[username]
+        if self.sfx_path is None:
+            return None
+        if self._sfx_store is not None and player.sfx_md5 is not None:
+            try:
+                blob = self._sfx_store.blob_path(player.sfx_md5)
+            except ValueError:
+                return None
+            return blob if os.path.isfile(blob) else None
+        player_sfx_path = os.path.join(self.sfx_path, player.username)
+        return player_sfx_path if os.path.isfile(player_sfx_path) else None
+
+    @property
+    def sfx_report(self):
+        """Get summary of the last SFX check."""
+        return self._sfx_report
 
     @property
     def sfx_path(self):
@@ -0,0 +1,171 @@
+"""SFX data storage."""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+from cbcentral.util import (
+    Base64StreamDecoder,
+    ChecksumCache,
+    JSONFieldStream,
+    md5_sum,
+)
+
+
+class SFXDownload:
+    """Streamed SFX data download.
+
+    The response document is fed in chunks, the base64 encoded "data"
+    field is decoded and written to a temporary file as it arrives so
+    memory use does not depend on the clip size.
+    """
+
+    def __init__(self, sfx_path):
+        """Initialize."""
+        self._fields = JSONFieldStream("data")
+        self._decoder = Base64StreamDecoder()
+        self._md5 = hashlib.md5()
+        # not NamedTemporaryFile, whose files are only readable by the
+        # owner and would keep that mode once moved into place
+        self._temp = open(
+            os.path.join(sfx_path, f".sfx-{uuid.uuid4().hex}"), "xb"
+        )
+
+    @property
+    def found(self):
+        """Get whether the response contained data."""
+        return self._fields.found
+
+    @property
+    def md5(self):
+        """Get MD5 sum of data received so far."""
+        return self._md5.hexdigest()
+
+    def feed(self, chunk):
+        """Feed chunk of response."""
+        data = self._decoder.feed(self._fields.feed(chunk))
+        self._md5.update(data)
+        self._temp.write(data)
+
+    def finish(self):
+        """Finish download, return the response without data."""
+        document = self._fields.finish()
+        self._decoder.finish()
+        return document
+
+    def commit(self, dest):
+        """Atomically move downloaded data to destination."""
+        self._temp.flush()
+        os.fsync(self._temp.fileno())
+        self._temp.close()
+        os.replace(self._temp.name, dest)
+        self._temp = None
+
+    def discard(self):
+        """Remove downloaded data if not committed."""
+        if self._temp is None:
+            return
+        self._temp.close()
+        try:
+            os.remove(self._temp.name)
+        except OSError:
+            pass
+        self._temp = None
+
+
+class SFXStore:
+    """Content-addressed SFX data store.
+
+    Each distinct clip is stored once, named by its MD5 sum. Per-player
+    files are hard links to stored clips, or copies where the file system
+    does not support hard links. Copies are compared with the clip by
+    their sums, kept in checksums (cbcentral.util.ChecksumCache) if
+    given.
+    """
+
+    _CHECKSUM = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, store_path, checksums: ChecksumCache = None):
+        """Initialize."""
+        self._path = store_path
+        self._checksums = checksums
+
+    @property
+    def path(self):
+        """Get store path."""
+        return self._path
+
+    def blob_path(self, checksum):
+        """Get path of stored clip."""
+        if not isinstance(checksum, str) or not self._CHECKSUM.fullmatch(
+            checksum
+        ):
+            raise ValueError(f"invalid SFX checksum: {checksum!r}")
+        return os.path.join(self._path, checksum)
+
+    def has(self, checksum):
+        """Get whether a clip is stored."""
+        return os.path.isfile(self.blob_path(checksum))
+
+    def add(self, download, checksum):
+        """Store verified download."""
+        os.makedirs(self._path, exist_ok=True)
+        download.commit(self.blob_path(checksum))
+
+    def link(self, checksum, dest):
+        """Atomically point dest to a stored clip.
+
+        Returns whether dest was changed.
+        """
+        blob = self.blob_path(checksum)
+        try:
+            if os.path.samefile(blob, dest):
+                return False
+            # copy where the file system has no hard links
+            if self._md5_sum(dest) == checksum:
+                return False
+        except FileNotFoundError:
+            pass
+
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".link-")
+        os.close(fd)
+        try:
+            os.remove(temp)
+            try:
+                os.link(blob, temp)
+            except OSError:
+                shutil.copyfile(blob, temp)
+            os.replace(temp, dest)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        if self._checksums is not None:
+            self._checksums.record(dest, checksum)
+        return True
+
+    def _md5_sum(self, file_name):
+        """Get MD5 sum of a file."""
+        if self._checksums is not None:
+            return self._checksums.md5_sum(file_name)
+        return md5_sum(file_name)
+
+    def collect(self, keep):
+        """Remove clips whose checksums are not in keep.
+
+        Returns the number of removed clips.
+        """
+        try:
+            names = os.listdir(self._path)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if name in keep or not self._CHECKSUM.fullmatch(name):
+                continue
+            os.remove(os.path.join(self._path, name))
+            removed += 1
+        return removed
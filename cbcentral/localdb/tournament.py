@@ -2,14 +2,24 @@
 
 from cbcentral.registry.entry import LocalRegistryEntry
 from cbcentral.registry import LocalRegistry
-from cbcentral.util import id_from_url
+from cbcentral.util import id_from_url, intern_value
 from cbcentral.localdb import LOCALDB_LOGGER
-from cbcentral.queries import query_tournaments
+from cbcentral.queries import query_tournaments, query_tournaments_async
 
 
 class TournamentEntry(LocalRegistryEntry):
     """Tournament registry entry."""
 
+    __slots__ = (
+        "_id",
+        "_season",
+        "_description",
+        "_date",
+        "_players",
+        "_status",
+        "_games",
+    )
+
     _index = "id"
     _fields = [
         "id",
@@ -20,6 +30,7 @@ class TournamentEntry(LocalRegistryEntry):
         "status",
         "games",
     ]
+    _secondary = ["season", "players", "status", "games"]
 
     def __init__(
         self,
@@ -40,7 +51,7 @@ class TournamentEntry(LocalRegistryEntry):
         self._date = event_date
         # abbreviate player data
         self._players = [id_from_url(player) for player in players]
-        self._status = status
+        self._status = intern_value(status)
         # also abbreviate
         self._games = self._get_game_ids(games)
 
@@ -97,13 +108,25 @@ class TournamentEntry(LocalRegistryEntry):
 class LocalTournamentRegistry(LocalRegistry):
     """Tournament registry retrieved from central server."""
 
-    def __init__(self, db_path):
-        """Initialize."""
-        super().__init__("tournament_registry", TournamentEntry, db_path)
+    _dependencies = ("player_registry",)
+    _upstream_path = ("api", "tournaments")
+
+    def __init__(self, db_path, **kwargs):
+        """Initialize.
+
+        Other arguments are passed to LocalRegistry.
+        """
+        super().__init__(
+            "tournament_registry", TournamentEntry, db_path, **kwargs
+        )
         LOCALDB_LOGGER.info("local tournament registry loaded")
 
-    def update_registry(self, api_obj):
-        """Update registry."""
-        LOCALDB_LOGGER.info("updating game registry from central server")
-        upstream_tournaments = query_tournaments(api_obj)
-        self.build_registry(upstream_tournaments)
+    def fetch_upstream(self, api_obj):
+        """Get tournaments from central server."""
+        LOCALDB_LOGGER.info("updating tournament registry from central server")
+        return query_tournaments(api_obj, conditional=True)
+
+    async def fetch_upstream_async(self, api_obj):
+        """Get tournaments from central server using asyncio."""
+        LOCALDB_LOGGER.info("updating tournament registry from central server")
+        return await query_tournaments_async(api_obj, conditional=True)
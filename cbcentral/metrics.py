@@ -0,0 +1,352 @@
+"""Built-in metrics.
+
+Counters, gauges and fixed-bucket histograms, optionally with labels,
+kept in a MetricsRegistry. The API clients and registries update the
+default registry, METRICS, unless given another one. Metrics can be read
+with MetricsRegistry.snapshot() or exported in the Prometheus text format
+with prometheus_text().
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Sequence, Tuple
+
+# latency buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MetricsError(Exception):
+    """Metric declared twice with different types or labels."""
+
+
+class _Metric:
+    """Metric with labelled children."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        """Initialize."""
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        """Create child for a set of label values."""
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Get child for label values, in the order of the label names."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError("wrong number of label values")
+            with self._lock:
+                child = self._children.setdefault(
+                    tuple(str(value) for value in values), self._new_child()
+                )
+                self._children[values] = child
+        return child
+
+    def samples(self) -> Dict[Tuple, object]:
+        """Get values of children by label values."""
+        with self._lock:
+            children = {
+                tuple(str(value) for value in values): child
+                for values, child in self._children.items()
+            }
+        return {values: child.value for values, child in children.items()}
+
+
+class _CounterChild:
+    """Counter value."""
+
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        """Initialize."""
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        """Increment counter."""
+        if amount < 0:
+            raise ValueError("counters can only be incremented")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        """Get value."""
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        """Create child for a set of label values."""
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        """Increment counter without labels."""
+        self._children[()].inc(amount)
+
+
+class _GaugeChild:
+    """Gauge value."""
+
+    __slots__ = ("_value", "_function", "_lock")
+
+    def __init__(self):
+        """Initialize."""
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        """Set value."""
+        self._value = value
+
+    def inc(self, amount=1.0):
+        """Increment value."""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1.0):
+        """Decrement value."""
+        self.inc(-amount)
+
+    def set_function(self, function: Callable):
+        """Get value by calling function when read, None to stop."""
+        self._function = function
+
+    @property
+    def value(self):
+        """Get value."""
+        function = self._function
+        if function is not None:
+            return function()
+        return self._value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        """Create child for a set of label values."""
+        return _GaugeChild()
+
+    def set(self, value):
+        """Set value of gauge without labels."""
+        self._children[()].set(value)
+
+    def inc(self, amount=1.0):
+        """Increment gauge without labels."""
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1.0):
+        """Decrement gauge without labels."""
+        self._children[()].dec(amount)
+
+    def set_function(self, function: Callable):
+        """Get value of gauge without labels by calling function."""
+        self._children[()].set_function(function)
+
+
+class _HistogramChild:
+    """Histogram bucket counts."""
+
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets):
+        """Initialize."""
+        self._buckets = buckets
+        # last count is for values above all buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record value."""
+        position = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+
+    @property
+    def value(self):
+        """Get cumulative bucket counts, sum and count."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        count = 0
+        for bound, bucket_count in zip(self._buckets + (math.inf,), counts):
+            count += bucket_count
+            cumulative.append((bound, count))
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+class Histogram(_Metric):
+    """Distribution of values in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labels=(),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Initialize."""
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        """Create child for a set of label values."""
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        """Record value in histogram without labels."""
+        self._children[()].observe(value)
+
+
+class MetricsRegistry:
+    """Named metrics."""
+
+    def __init__(self):
+        """Initialize."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _declare(self, metric_class, name, documentation, labels, **kwargs):
+        """Get metric, creating it if needed."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, labels, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not metric_class:
+                raise MetricsError(f"metric {name} declared as {metric.kind}")
+            elif metric.label_names != tuple(labels):
+                raise MetricsError(f"metric {name} has other labels")
+        return metric
+
+    def counter(self, name, documentation, labels=()) -> Counter:
+        """Get counter."""
+        return self._declare(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()) -> Gauge:
+        """Get gauge."""
+        return self._declare(Gauge, name, documentation, labels)
+
+    def histogram(
+        self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Get histogram."""
+        return self._declare(
+            Histogram, name, documentation, labels, buckets=buckets
+        )
+
+    def __iter__(self):
+        """Iterate over metrics."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return iter(metrics)
+
+    def snapshot(self) -> Dict:
+        """Get current values of all metrics.
+
+        Maps metric names to their type, label names and values by label
+        values. Histogram values hold cumulative bucket counts, the sum
+        and the count.
+        """
+        return {
+            metric.name: {
+                "type": metric.kind,
+                "labels": list(metric.label_names),
+                "values": metric.samples(),
+            }
+            for metric in self
+        }
+
+
+METRICS = MetricsRegistry()
+
+
+def _format_value(value):
+    """Format sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values):
+    """Format label set."""
+    if not names:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"'),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + labels + "}"
+
+
+def prometheus_text(registry: MetricsRegistry = None) -> str:
+    """Export metrics in the Prometheus text exposition format."""
+    registry = registry if registry is not None else METRICS
+    lines = []
+    for metric in registry:
+        documentation = metric.documentation.replace("\\", "\\\\").replace(
+            "\n", "\\n"
+        )
+        lines.append(f"# HELP {metric.name} {documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, value in sorted(metric.samples().items()):
+            if metric.kind != "histogram":
+                labels = _format_labels(metric.label_names, values)
+                lines.append(f"{metric.name}{labels} {_format_value(value)}")
+                continue
+            for bound, count in value["buckets"]:
+                labels = _format_labels(
+                    metric.label_names + ("le",),
+                    values + (_format_value(float(bound)),),
+                )
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+            labels = _format_labels(metric.label_names, values)
+            lines.append(
+                f"{metric.name}_sum{labels} {_format_value(value['sum'])}"
+            )
+            lines.append(f"{metric.name}_count{labels} {value['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,216 @@
+"""Outgoing request queue."""
+
+import random
+import time
+from collections import deque
+from typing import Dict, NamedTuple
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+
+class OutgoingRequest(NamedTuple):
+    """Queued POST request."""
+
+    data: Dict
+    sub_api: str
+    path: str
+    retry: bool
+    group: str = None
+    batch_path: str = None
+    priority: int = PRIORITY_NORMAL
+    timestamp: float = 0.0
+    attempts: int = 0
+    not_before: float = 0.0
+    ident: int = None
+
+    @property
+    def record(self):
+        """Get persistent part of request."""
+        return {
+            "data": self.data,
+            "sub_api": self.sub_api,
+            "path": self.path,
+            "retry": self.retry,
+            "group": self.group,
+            "batch_path": self.batch_path,
+            "priority": self.priority,
+        }
+
+
+class OutgoingQueue:
+    """Outgoing requests, in one ordered lane per group.
+
+    Requests of a group are delivered in order, but a lane that is backing
+    off does not hold up the others. The next lane to be served is the one
+    whose first request has the highest priority, and lanes with the same
+    priority are served in turn.
+
+    If batch_size is set, consecutive requests of a lane that have the
+    same batch path are taken together, up to batch_size. A partial batch
+    is held back until its oldest request is batch_linger seconds old.
+
+    Failed requests are retried after a jittered exponential backoff
+    starting at backoff_base seconds and capped at backoff_max. They are
+    moved to the dead letters after max_attempts deliveries or once they
+    are older than expiry seconds, if set.
+    """
+
+    def __init__(
+        self,
+        batch_size=None,
+        batch_linger=0.0,
+        backoff_base=0.5,
+        backoff_max=60.0,
+        max_attempts=None,
+        expiry=None,
+    ):
+        """Initialize."""
+        self._lanes = {}
+        self._rotation = deque()
+        self._length = 0
+        self._batch_size = batch_size
+        self._batch_linger = batch_linger
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._max_attempts = max_attempts
+        self._expiry = expiry
+        self.dead_letters = []
+
+    def __len__(self):
+        """Get number of queued requests."""
+        return self._length
+
+    def _lane(self, group):
+        """Get lane, creating it if needed."""
+        if group not in self._lanes:
+            self._lanes[group] = deque()
+            self._rotation.append(group)
+        return self._lanes[group]
+
+    def push(self, request):
+        """Queue request."""
+        self._lane(request.group).append(request)
+        self._length += 1
+
+    def _batch_length(self, lane):
+        """Get number of requests to be taken from the lane."""
+        head = lane[0]
+        if self._batch_size is None or head.batch_path is None:
+            return 1
+        length = 0
+        for request in lane:
+            if (
+                length == self._batch_size
+                or request.batch_path != head.batch_path
+            ):
+                break
+            length += 1
+        return length
+
+    def _lane_due(self, lane):
+        """Get time when the lane can be served."""
+        head = lane[0]
+        if (
+            head.batch_path is not None
+            and self._batch_size is not None
+            and self._batch_length(lane) < self._batch_size
+        ):
+            # wait for more requests
+            return max(head.not_before, head.timestamp + self._batch_linger)
+        return head.not_before
+
+    def take(self, now=None, exclude=()):
+        """Take next requests to be delivered, empty if none are due.
+
+        Lanes of groups in exclude are not considered, so that requests of
+        a group are not delivered concurrently.
+        """
+        now = time.monotonic() if now is None else now
+        chosen = None
+        chosen_priority = None
+        for group in self._rotation:
+            if group in exclude:
+                continue
+            lane = self._lanes[group]
+            if self._lane_due(lane) > now:
+                continue
+            if chosen is None or lane[0].priority < chosen_priority:
+                chosen = group
+                chosen_priority = lane[0].priority
+
+        if chosen is None:
+            return []
+
+        lane = self._lanes[chosen]
+        batch = [lane.popleft() for _ in range(self._batch_length(lane))]
+        self._length -= len(batch)
+        self._rotation.remove(chosen)
+        if lane:
+            self._rotation.append(chosen)
+        else:
+            del self._lanes[chosen]
+        return batch
+
+    def reschedule(self, failed, now=None):
+        """Put failed requests back in their lanes with backoff.
+
+        Returns the requests that were given up on.
+        """
+        now = time.monotonic() if now is None else now
+        dead = []
+        for request in reversed(failed):
+            attempts = request.attempts + 1
+            if (
+                not request.retry
+                or (
+                    self._max_attempts is not None
+                    and attempts >= self._max_attempts
+                )
+                or (
+                    self._expiry is not None
+                    and now - request.timestamp > self._expiry
+                )
+            ):
+                dead.append(request)
+                continue
+            delay = min(
+                self._backoff_max, self._backoff_base * 2 ** (attempts - 1)
+            )
+            self._lane(request.group).appendleft(
+                request._replace(
+                    attempts=attempts,
+                    not_before=now + delay * random.uniform(0.5, 1.0),
+                )
+            )
+            self._length += 1
+        dead.reverse()
+        self.dead_letters.extend(dead)
+        return dead
+
+    def restore(self, batch):
+        """Put taken requests back at the front of their lane."""
+        self._lane(batch[0].group).extendleft(reversed(batch))
+        self._length += len(batch)
+
+    def next_delay(self, now=None, exclude=()):
+        """Get time until a lane can be served, None if queue is empty.
+
+        Lanes of groups in exclude are not considered.
+        """
+        lanes = [
+            lane for group, lane in self._lanes.items() if group not in exclude
+        ]
+        if not lanes:
+            return None
+        now = time.monotonic() if now is None else now
+        due = min(self._lane_due(lane) for lane in lanes)
+        return max(0.0, due - now)
+
+    def lane_stats(self, now=None):
+        """Get depth and oldest request age per lane."""
+        now = time.monotonic() if now is None else now
+        return {
+            group: {"depth": len(lane), "age": now - lane[0].timestamp}
+            for group, lane in self._lanes.items()
+        }
@@ -1,24 +1,32 @@
 """Query information using central API."""
 
 
-def query_players(api_obj):
+def query_players(api_obj, conditional=False):
     """Query registered players from central server."""
-    return api_obj.central_api_get(sub_api="api", path="players")
+    return api_obj.central_api_get(
+        sub_api="api", path="players", conditional=conditional
+    )
 
 
-def query_tournaments(api_obj):
+def query_tournaments(api_obj, conditional=False):
     """Query tournaments."""
-    return api_obj.central_api_get(sub_api="api", path="tournaments")
+    return api_obj.central_api_get(
+        sub_api="api", path="tournaments", conditional=conditional
+    )
 
 
-def query_games(api_obj):
+def query_games(api_obj, conditional=False):
     """Query games."""
-    return api_obj.central_api_get(sub_api="api", path="games")
+    return api_obj.central_api_get(
+        sub_api="api", path="games", conditional=conditional
+    )
 
 
-def query_announcements(api_obj):
+def query_announcements(api_obj, conditional=False):
     """Query announcements."""
-    return api_obj.central_api_get(sub_api="api", path="announce")
+    return api_obj.central_api_get(
+        sub_api="api", path="announce", conditional=conditional
+    )
 
 
 def get_sfx_data(player, api_obj):
@@ -26,3 +34,52 @@ def get_sfx_data(player, api_obj):
     return api_obj.central_api_get(
         sub_api="api", path=f"players/{player}/get_sfx_data"
     )
+
+
+def stream_sfx_data(player, api_obj):
+    """Get player SFX data response in chunks."""
+    return api_obj.central_api_stream(
+        sub_api="api", path=f"players/{player}/get_sfx_data"
+    )
+
+
+async def query_players_async(api_obj, conditional=False):
+    """Query registered players from central server using asyncio."""
+    return await api_obj.central_api_get(
+        sub_api="api", path="players", conditional=conditional
+    )
+
+
+async def query_tournaments_async(api_obj, conditional=False):
+    """Query tournaments using asyncio."""
+    return await api_obj.central_api_get(
+        sub_api="api", path="tournaments", conditional=conditional
+    )
+
+
+async def query_games_async(api_obj, conditional=False):
+    """Query games using asyncio."""
+    return await api_obj.central_api_get(
+        sub_api="api", path="games", conditional=conditional
+    )
+
+
+async def query_announcements_async(api_obj, conditional=False):
+    """Query announcements using asyncio."""
+    return await api_obj.central_api_get(
+        sub_api="api", path="announce", conditional=conditional
+    )
+
+
+async def get_sfx_data_async(player, api_obj):
+    """Get player SFX data using asyncio."""
+    return await api_obj.central_api_get(
+        sub_api="api", path=f"players/{player}/get_sfx_data"
+    )
+
+
+def stream_sfx_data_async(player, api_obj):
+    """Get player SFX data response in chunks using asyncio."""
+    return api_obj.central_api_stream(
+        sub_api="api", path=f"players/{player}/get_sfx_data"
+    )
@@ -1,8 +1,21 @@
 """Registry."""
 
-from typing import Type, List
-import json
-import os
+import asyncio
+import threading
+import time
+from typing import Type, List, Tuple, Callable
+
+from cbcentral import tracing
+from cbcentral.metrics import METRICS, MetricsRegistry
+
+from cbcentral.registry.changes import ChangeSet, fingerprint
+from cbcentral.registry.lazy import LazyEntries
+from cbcentral.registry.storage import (
+    RegistryStorage,
+    JSONStorage,
+    StorageError,
+)
+from cbcentral.registry.view import RegistryView
 
 
 class RegistryError(Exception):
@@ -12,43 +25,205 @@ class RegistryError(Exception):
 class LocalRegistry:
     """Local registry."""
 
-    def __init__(self, registry_name: str, entry_class: Type, db_path: str):
-        """Initialize."""
-        self._entry_class = entry_class
+    # names of registries that must be applied before this one
+    _dependencies: Tuple[str, ...] = ()
+    # sub-API and path of the upstream contents, to forget their validators
+    _upstream_path: Tuple[str, str] = None
 
-        self._registry_location = os.path.join(
-            db_path, registry_name + ".json"
-        )
+    def __init__(
+        self,
+        registry_name: str,
+        entry_class: Type,
+        db_path: str,
+        journal: bool = False,
+        snapshot: bool = False,
+        storage: Callable[..., RegistryStorage] = None,
+        lazy: bool = False,
+        cache_size: int = 1024,
+        metrics: MetricsRegistry = None,
+    ):
+        """Initialize.
 
-        if not os.path.exists(self._registry_location):
-            try:
-                with open(self._registry_location, "w") as registry:
-                    registry.write("[]")
+        The registry is kept in storage created by calling storage with
+        db_path, registry_name and entry_class, by default a JSONStorage.
+        If journal is set, the default storage appends the entries that
+        changed to a journal file instead of rewriting the registry file.
+        If snapshot is set, it keeps a binary snapshot of the registry
+        file that is faster to load.
 
-            except OSError:
-                raise RegistryError("cannot create registry")
+        If lazy is set, entries are kept serialized, or in the snapshot,
+        and only built when accessed, keeping up to cache_size of them.
+
+        Build and commit times, changes and the entry count are recorded
+        in metrics, by default cbcentral.metrics.METRICS.
+        """
+        self._registry_name = registry_name
+        self._entry_class = entry_class
+        self._lazy = lazy
+        self._cache_size = cache_size
+        self._dirty = False
+        self._needs_snapshot = False
+        self._pending_changes = []
+        self._listeners = []
+        # held while building, committing and notifying
+        self._write_lock = threading.RLock()
+        self._init_metrics(metrics if metrics is not None else METRICS)
+
+        if storage is None:
+            self._storage = JSONStorage(
+                db_path,
+                registry_name,
+                entry_class,
+                journal=journal,
+                snapshot=snapshot,
+            )
+        else:
+            self._storage = storage(db_path, registry_name, entry_class)
 
         # load registry
         try:
-            with open(self._registry_location, "r") as registry:
-                _registry_contents = json.load(registry)
-        except (OSError, json.JSONDecodeError):
-            raise RegistryError("cannot load registry.")
+            _registry_contents = self._storage.load()
+        except StorageError as error:
+            raise RegistryError(str(error))
 
         # build
-        self._registry_contents = []
+        self._view = RegistryView(entry_class)
         self._initializing = True
         self.build_registry(_registry_contents)
         self._initializing = False
 
+    def _init_metrics(self, metrics):
+        """Declare metrics."""
+        name = self._registry_name
+        self._build_seconds = metrics.histogram(
+            "cbcentral_registry_build_seconds",
+            "Registry build time in seconds.",
+            ("registry",),
+        ).labels(name)
+        self._commit_seconds = metrics.histogram(
+            "cbcentral_registry_commit_seconds",
+            "Registry commit time in seconds.",
+            ("registry",),
+        ).labels(name)
+        changes = metrics.counter(
+            "cbcentral_registry_changes_total",
+            "Registry entries added, removed or modified by builds.",
+            ("registry", "change"),
+        )
+        self._changes_added = changes.labels(name, "added")
+        self._changes_removed = changes.labels(name, "removed")
+        self._changes_modified = changes.labels(name, "modified")
+        self._entry_count = metrics.gauge(
+            "cbcentral_registry_entries",
+            "Registry entries.",
+            ("registry",),
+        ).labels(name)
+
+    @property
+    def storage(self):
+        """Get storage backend."""
+        return self._storage
+
+    @property
+    def dirty(self):
+        """Get whether there are changes that were not committed."""
+        return self._dirty
+
+    @property
+    def name(self):
+        """Get registry name."""
+        return self._registry_name
+
+    @classmethod
+    def get_dependencies(cls) -> Tuple[str, ...]:
+        """Get names of registries this one depends on."""
+        return cls._dependencies
+
     @property
     def serialized(self):
         """Get serialized."""
-        return [item.serialized for item in self._registry_contents]
+        contents = self._view.contents
+        if self._lazy:
+            return list(contents.records)
+        return [item.serialized for item in contents]
+
+    def fetch_upstream(self, api_obj):
+        """Get registry contents from central server.
+
+        Returns None if they were not modified since the last fetch.
+        """
+        raise NotImplementedError
+
+    async def fetch_upstream_async(self, api_obj):
+        """Get registry contents from central server using asyncio."""
+        raise NotImplementedError
+
+    def apply_upstream(self, contents, api_obj):
+        """Apply contents fetched from central server."""
+        self.build_registry(contents)
+
+    async def apply_upstream_async(self, contents, api_obj):
+        """Apply contents fetched from central server using asyncio.
+
+        Contents are applied in a worker thread so that the event loop is
+        not blocked, callbacks and listeners are called from it.
+        """
+        await asyncio.to_thread(self.apply_upstream, contents, api_obj)
+
+    def apply_unchanged(self, api_obj):
+        """Contents were not modified on the central server.
+
+        Commits changes left over from a failed commit.
+        """
+        self.commit_registry()
+
+    async def apply_unchanged_async(self, api_obj):
+        """Contents were not modified, using asyncio."""
+        await asyncio.to_thread(self.apply_unchanged, api_obj)
+
+    def forget_upstream(self, api_obj):
+        """Forget validators, so that contents are fetched in full again."""
+        if self._upstream_path is None:
+            api_obj.forget_validators()
+        else:
+            api_obj.forget_validators(*self._upstream_path)
 
     def update_registry(self, api_obj):
         """Update registry."""
-        raise NotImplementedError
+        with tracing.span("registry.update", registry=self._registry_name):
+            with tracing.span("registry.fetch", registry=self._registry_name):
+                contents = self.fetch_upstream(api_obj)
+            try:
+                if contents is None:
+                    # not modified
+                    self.apply_unchanged(api_obj)
+                    return
+                with tracing.span(
+                    "registry.apply", registry=self._registry_name
+                ):
+                    self.apply_upstream(contents, api_obj)
+            except Exception:
+                # contents not applied or committed must be fetched again
+                self.forget_upstream(api_obj)
+                raise
+
+    async def update_registry_async(self, api_obj):
+        """Update registry using asyncio."""
+        with tracing.span("registry.update", registry=self._registry_name):
+            with tracing.span("registry.fetch", registry=self._registry_name):
+                contents = await self.fetch_upstream_async(api_obj)
+            try:
+                if contents is None:
+                    # not modified
+                    await self.apply_unchanged_async(api_obj)
+                    return
+                with tracing.span(
+                    "registry.apply", registry=self._registry_name
+                ):
+                    await self.apply_upstream_async(contents, api_obj)
+            except Exception:
+                self.forget_upstream(api_obj)
+                raise
 
     def value_changed(self, entry_index, field_name, old_value, new_value):
         """Value changed callback."""
@@ -56,65 +231,392 @@ class LocalRegistry:
     def new_entry(self, content):
         """New entry callback."""
 
-    def build_registry(self, contents: List):
-        """Build registry."""
+    def build_registry(self, contents: List) -> ChangeSet:
+        """Build registry.
+
+        Returns the changes made to the registry, which are also passed
+        to the callbacks and subscribed listeners once the new version is
+        published. Entries built from the same upstream record as in the
+        last build are kept as they are.
+        """
+        with self._write_lock, tracing.span(
+            "registry.build", registry=self._registry_name
+        ) as span:
+            start = time.perf_counter()
+            changes = self._build_registry(contents)
+            self._build_seconds.observe(time.perf_counter() - start)
+            span.set(
+                entries=len(self._view),
+                added=len(changes.added),
+                removed=len(changes.removed),
+                modified=len(changes.modified),
+            )
+            self._entry_count.set(len(self._view))
+            if changes:
+                self._changes_added.inc(len(changes.added))
+                self._changes_removed.inc(len(changes.removed))
+                self._changes_modified.inc(len(changes.modified))
+            with tracing.span("registry.notify", registry=self._registry_name):
+                self._notify(changes)
+            return changes
+
+    def _build_registry(self, contents):
+        """Build next version of the registry and publish it."""
+        if self._lazy and self._initializing:
+            self._load_lazy(contents)
+            return ChangeSet()
+        if self._initializing:
+            # stored records are not upstream records, would never match
+            fingerprints = None
+        else:
+            with tracing.span(
+                "registry.fingerprint", registry=self._registry_name
+            ):
+                fingerprints = [fingerprint(item) for item in contents]
+            if len(fingerprints) == len(self._view.contents) and all(
+                self._view.fingerprints.get(item_fingerprint) == position
+                for position, item_fingerprint in enumerate(fingerprints)
+            ):
+                # same upstream records in the same order
+                return ChangeSet()
+        changes = ChangeSet()
+        old_index = self._view.index
         new_registry_contents = []
-        for item in contents:
-            new_content = self._entry_class(**item)
-            new_registry_contents.append(new_content)
-            try:
-                index_key = self._entry_class.get_index_name()
+        new_records = [] if self._lazy else None
+        new_registry_index = {}
+        new_fingerprints = {}
+        new_secondary_indexes = {
+            field: {}
+            for field in self._entry_class.get_secondary_index_names()
+        }
+        index_key = self._entry_class.get_index_name()
+        # positions of new and changed entries, including changes to
+        # unknown upstream fields
+        changed = []
+        # time spent building and comparing entries, when traced
+        traced = tracing.enabled()
+        construct_time = diff_time = 0.0
+        reused = 0
+        with tracing.span(
+            "registry.entries", registry=self._registry_name
+        ) as span:
+            for position, item in enumerate(contents):
+                if fingerprints is not None:
+                    item_fingerprint = fingerprints[position]
+                    new_fingerprints.setdefault(item_fingerprint, position)
+                    new_content, new_record = self._reuse_entry(
+                        self._view.fingerprints.get(item_fingerprint)
+                    )
+                else:
+                    new_content = new_record = None
+                if new_content is not None or new_record is not None:
+                    reused += 1
+                else:
+                    if traced:
+                        start = time.perf_counter()
+                    new_content = self._entry_class(**item)
+                    if self._lazy:
+                        new_record = new_content.serialized
+                    if traced:
+                        construct_time += time.perf_counter() - start
+                        start = time.perf_counter()
+                    if index_key is not None and not self._initializing:
+                        if self._diff_entry(new_content, new_record, changes):
+                            changed.append(position)
+                    if traced:
+                        diff_time += time.perf_counter() - start
+                if self._lazy:
+                    new_records.append(new_record)
+                else:
+                    new_registry_contents.append(new_content)
                 if index_key is not None:
-                    index_value = item[index_key]
-                    if not self._initializing and index_value not in self:
-                        # new content
-                        self.new_entry(new_content)
-                    current_content = self[index_value]
-                    if (
-                        not self._initializing
-                        and current_content != new_content
-                    ):
-                        modified_fields = current_content.compare_entries(
-                            new_content
-                        )
-                        for (
-                            field_name,
-                            (old_value, new_value),
-                        ) in modified_fields.items():
-                            self.value_changed(
-                                index_value, field_name, old_value, new_value
-                            )
-            except KeyError:
-                pass
-        # self._registry_contents = [
-        #     self._entry_class(**item) for item in contents
-        # ]
-        self._registry_contents = new_registry_contents
+                    new_registry_index.setdefault(
+                        self._field_value(new_content, new_record, index_key),
+                        position,
+                    )
+                for field, index in new_secondary_indexes.items():
+                    self._add_to_index(
+                        index,
+                        self._field_value(new_content, new_record, field),
+                        position,
+                    )
+            span.set(
+                reused=reused,
+                construct_seconds=construct_time,
+                diff_seconds=diff_time,
+            )
+
+        if index_key is not None and not self._initializing:
+            changes.removed = [
+                self._view.contents[position]
+                for index_value, position in old_index.items()
+                if index_value not in new_registry_index
+            ]
+        if not self._initializing:
+            with tracing.span("registry.track", registry=self._registry_name):
+                self._track_changes(
+                    new_registry_contents,
+                    new_registry_index,
+                    new_records,
+                    changed,
+                )
+        if self._lazy:
+            new_registry_contents = LazyEntries(
+                self._entry_class, new_records, self._cache_size
+            )
+        self._view = RegistryView(
+            self._entry_class,
+            new_registry_contents,
+            new_registry_index,
+            new_secondary_indexes,
+            new_fingerprints,
+        )
+        return changes
+
+    def _reuse_entry(self, old_position):
+        """Get entry and record to keep from the last build.
+
+        Both are None if there is no entry to keep, the record is None in
+        eager mode and the entry is None in lazy mode.
+        """
+        if old_position is None:
+            return None, None
+        index_key = self._entry_class.get_index_name()
+        if self._lazy:
+            entry = None
+            record = self._view.contents.record(old_position)
+        else:
+            entry = self._view.contents[old_position]
+            record = None
+        if (
+            index_key is not None
+            and self._view.index.get(
+                self._field_value(entry, record, index_key)
+            )
+            != old_position
+        ):
+            # shadowed by an entry with the same index value
+            return None, None
+        return entry, record
+
+    @staticmethod
+    def _field_value(entry, record, field):
+        """Get field value from entry, or from record if not built."""
+        if entry is not None:
+            return getattr(entry, field)
+        return record[field]
+
+    def _diff_entry(self, entry, record, changes):
+        """Add differences of a new entry to the stored one to changes.
+
+        Returns whether the entry is new or differs in any way.
+        """
+        index_value = entry.index
+        old_position = self._view.index.get(index_value)
+        if old_position is None:
+            changes.added.append(entry)
+            return True
+        if self._same_entry(old_position, entry, record):
+            return False
+        modified_fields = self._view.contents[old_position].compare_entries(
+            entry
+        )
+        if modified_fields:
+            changes.modified[index_value] = modified_fields
+        return True
+
+    def _notify(self, changes):
+        """Pass changes to callbacks and listeners."""
+        if not changes:
+            return
+        for entry in changes.added:
+            self.new_entry(entry)
+        for index_value, modified_fields in changes.modified.items():
+            for field_name, (old_value, new_value) in modified_fields.items():
+                self.value_changed(
+                    index_value, field_name, old_value, new_value
+                )
+        for listener in list(self._listeners):
+            listener(self, changes)
+
+    def subscribe(self, listener: Callable):
+        """Call listener with the registry and a ChangeSet on changes."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable):
+        """Stop calling listener."""
+        self._listeners.remove(listener)
+
+    def _load_lazy(self, records):
+        """Index stored records without building entries."""
+        contents = LazyEntries(self._entry_class, records, self._cache_size)
+        index_key = self._entry_class.get_index_name()
+        registry_index = {}
+        if index_key is not None:
+            for position, value in enumerate(contents.column(index_key)):
+                registry_index.setdefault(value, position)
+        secondary_indexes = {}
+        for field in self._entry_class.get_secondary_index_names():
+            index = secondary_indexes[field] = {}
+            for position, value in enumerate(contents.column(field)):
+                self._add_to_index(index, value, position)
+        self._view = RegistryView(
+            self._entry_class, contents, registry_index, secondary_indexes
+        )
+
+    def _same_entry(self, position, entry, record=None):
+        """Check if the entry at position is identical to a new entry.
+
+        In lazy mode, the serialized record of the new entry is compared.
+        """
+        if self._lazy:
+            return self._view.contents.record(position) == record
+        return self._view.contents[position].identical(entry)
+
+    def _track_changes(self, new_contents, new_index, new_records, changed):
+        """Record changes to registry contents for the next commit.
+
+        changed holds the positions of new entries and entries that
+        differ from the stored ones.
+        """
+        old_index = self._view.index
+        new_count = len(new_records) if self._lazy else len(new_contents)
+        if (
+            self._entry_class.get_index_name() is None
+            or len(new_index) != new_count
+            or len(old_index) != len(self._view.contents)
+        ):
+            # changes cannot be recorded per entry
+            if self._lazy:
+                new_serialized = new_records
+            else:
+                new_serialized = [entry.serialized for entry in new_contents]
+            if new_serialized != self.serialized:
+                self._dirty = True
+                self._needs_snapshot = True
+            return
+
+        removed = [index for index in old_index if index not in new_index]
+        # replaying changes keeps entries in place and appends new ones
+        replayed_order = [
+            index for index in old_index if index in new_index
+        ] + [index for index in new_index if index not in old_index]
+        if replayed_order != list(new_index):
+            self._dirty = True
+            self._needs_snapshot = True
+        if not removed and not changed:
+            return
+        self._dirty = True
+        if not self._storage.incremental or self._needs_snapshot:
+            return
+        pending = len(self._pending_changes) + len(removed) + len(changed)
+        if 2 * pending > len(new_index):
+            # rewriting all entries is cheaper
+            self._needs_snapshot = True
+            self._pending_changes = []
+            return
+        self._pending_changes.extend(
+            {"op": "del", "index": index} for index in removed
+        )
+        self._pending_changes.extend(
+            {
+                "op": "put",
+                "entry": (
+                    new_records[position]
+                    if self._lazy
+                    else new_contents[position].serialized
+                ),
+            }
+            for position in changed
+        )
+
+    @staticmethod
+    def _add_to_index(index, value, position):
+        """Add entry position to a secondary index."""
+        values = value if isinstance(value, list) else [value]
+        for element in values:
+            try:
+                bucket = index.setdefault(element, [])
+            except TypeError:
+                # unhashable, cannot be indexed
+                continue
+            if not bucket or bucket[-1] != position:
+                bucket.append(position)
+
+    def find(self, **criteria):
+        """Find entries matching all criteria.
+
+        See RegistryView.find.
+        """
+        return self._view.find(**criteria)
+
+    def view(self) -> RegistryView:
+        """Get current version of the registry.
+
+        The view does not change when the registry is updated, reading it
+        needs no locking.
+        """
+        return self._view
 
     def commit_registry(self):
-        """Commit to disk."""
-        with open(self._registry_location, "w") as registry:
-            json.dump(self.serialized, registry, indent=2)
+        """Commit to storage.
 
-    def __getitem__(self, item):
-        if self._entry_class.get_index_name() is not None:
-            for element in self._registry_contents:
-                if element.index == item:
-                    return element
+        Nothing is written if there are no changes. Storage backends that
+        can store changes to entries are given only those.
+        """
+        with self._write_lock:
+            if not self._dirty:
+                return
+            start = time.perf_counter()
+            try:
+                with tracing.span(
+                    "registry.commit", registry=self._registry_name
+                ):
+                    self._write_changes()
+            except StorageError as error:
+                raise RegistryError(str(error))
+            self._dirty = False
+            self._needs_snapshot = False
+            self._pending_changes = []
+            self._commit_seconds.observe(time.perf_counter() - start)
 
-        raise KeyError
+    def _write_changes(self):
+        """Store pending changes, or all entries if needed."""
+        if not self._needs_snapshot:
+            with tracing.span(
+                "storage.append", changes=len(self._pending_changes)
+            ):
+                if self._storage.append(self._pending_changes):
+                    return
+        with tracing.span("storage.write", entries=len(self._view)):
+            serialized = self.serialized
+            self._storage.write(serialized)
+        if self._lazy:
+            # prefer records mapped from storage to keeping them
+            mapped = self._storage.mapped()
+            self._view = self._view.with_contents(
+                LazyEntries(
+                    self._entry_class,
+                    mapped if mapped is not None else serialized,
+                    self._cache_size,
+                )
+            )
+
+    def close(self):
+        """Close storage."""
+        self._storage.close()
+
+    def __getitem__(self, item):
+        """Get entry by index value."""
+        return self._view[item]
 
     def __iter__(self):
         """Get iterator."""
-        return iter(self._registry_contents)
+        return iter(self._view)
 
     def __contains__(self, item):
         """Contains or not."""
-        try:
-            _ = self[item]
-            return True
-        except KeyError:
-            return False
+        return item in self._view
 
     @property
     def data_layout(self):
@@ -0,0 +1,35 @@
+"""Registry change sets."""
+
+import hashlib
+from typing import Dict
+
+
+def fingerprint(record: Dict) -> bytes:
+    """Get fingerprint of an upstream record's contents."""
+    return hashlib.blake2b(repr(record).encode(), digest_size=16).digest()
+
+
+class ChangeSet:
+    """Changes made to a registry by a build.
+
+    added and removed hold entries, modified maps the index value of each
+    entry that changed to {field: (old value, new value)}. Changes to
+    unknown upstream fields only are not reported.
+    """
+
+    def __init__(self, added=None, removed=None, modified=None):
+        """Initialize."""
+        self.added = added if added is not None else []
+        self.removed = removed if removed is not None else []
+        self.modified = modified if modified is not None else {}
+
+    def __bool__(self):
+        """Get whether there are changes."""
+        return bool(self.added or self.removed or self.modified)
+
+    def __repr__(self):
+        """Get representation."""
+        return (
+            f"<ChangeSet added={len(self.added)} "
+            f"removed={len(self.removed)} modified={len(self.modified)}>"
+        )
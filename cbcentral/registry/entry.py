@@ -4,14 +4,21 @@ from typing import List, Dict
 
 
 class LocalRegistryEntry:
-    """Local registry entry."""
+    """Local registry entry.
+
+    Entries declare their attributes in __slots__ to keep them compact.
+    """
+
+    __slots__ = ("_kwargs",)
 
     _index: str = None
     _fields: List[str] = []
+    _secondary: List[str] = []
 
     def __init__(self, **kwargs):
         """Initialize."""
-        self._kwargs = kwargs
+        # unknown upstream fields, kept for serialization
+        self._kwargs = kwargs if kwargs else None
 
     @property
     def index(self):
@@ -26,6 +33,11 @@ class LocalRegistryEntry:
         """Get index member name."""
         return cls._index
 
+    @classmethod
+    def get_secondary_index_names(cls) -> List[str]:
+        """Get secondary index member names."""
+        return cls._secondary
+
     @classmethod
     def get_field_names(cls) -> List[str]:
         """Get fields."""
@@ -35,7 +47,8 @@ class LocalRegistryEntry:
     def serialized(self) -> Dict:
         """Get serialized."""
         serialized = {arg: getattr(self, arg) for arg in self._fields}
-        serialized.update(self._kwargs)
+        if self._kwargs is not None:
+            serialized.update(self._kwargs)
         return serialized
 
     def __eq__(self, other):
@@ -56,6 +69,10 @@ class LocalRegistryEntry:
         field_values = tuple([getattr(self, field) for field in self._fields])
         return hash(field_values)
 
+    def identical(self, other):
+        """Check if fields and unknown upstream fields are all equal."""
+        return self == other and self._kwargs == other._kwargs
+
     def compare_entries(self, other):
         """Compare entries."""
         if not isinstance(other, LocalRegistryEntry):
@@ -0,0 +1,69 @@
+"""Lazily built registry entries."""
+
+import threading
+from collections import OrderedDict
+
+
+class LazyEntries:
+    """Registry entries built from serialized records when accessed.
+
+    Records may be a list or a memory-mapped sequence. Up to cache_size
+    built entries are kept, the least recently used are dropped first.
+    Iterating does not fill the cache.
+    """
+
+    def __init__(self, entry_class, records, cache_size=1024):
+        """Initialize."""
+        self._entry_class = entry_class
+        self._records = records
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def records(self):
+        """Get serialized records."""
+        return self._records
+
+    @property
+    def cached(self):
+        """Get number of entries currently built."""
+        return len(self._cache)
+
+    def record(self, position):
+        """Get serialized record."""
+        return self._records[position]
+
+    def column(self, field):
+        """Get values of a field for all records."""
+        column = getattr(self._records, "column", None)
+        if column is not None:
+            return column(field)
+        return [record.get(field) for record in self._records]
+
+    def __len__(self):
+        """Get number of entries."""
+        return len(self._records)
+
+    def __getitem__(self, position):
+        """Get entry, building it if needed."""
+        with self._lock:
+            entry = self._cache.get(position)
+            if entry is not None:
+                self._cache.move_to_end(position)
+                return entry
+        entry = self._entry_class(**self._records[position])
+        with self._lock:
+            self._cache[position] = entry
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    def __iter__(self):
+        """Iterate over entries."""
+        for position in range(len(self._records)):
+            with self._lock:
+                entry = self._cache.get(position)
+            if entry is None:
+                entry = self._entry_class(**self._records[position])
+            yield entry
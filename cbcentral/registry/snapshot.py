@@ -0,0 +1,261 @@
+"""Binary registry snapshots.
+
+A snapshot holds the serialized entries of a registry as marshal encoded
+rows, one per entry, found through a table of offsets so that any entry
+can be decoded on its own. The values of the index and secondary index
+fields are also stored column by column, so that indexes can be built
+without decoding the rows.
+
+The header records the format and marshal versions, a digest of the entry
+schema, a checksum of the data and the size and modification time of the
+file the snapshot was made from, so snapshots that do not match are
+detected and not used.
+"""
+
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Type
+
+SNAPSHOT_MAGIC = b"CBRSNAP\0"
+SNAPSHOT_VERSION = 2
+
+# magic, format version, python version, marshal version, schema digest,
+# data checksum, source size, source modification time, entry count,
+# column count
+_HEADER = struct.Struct("<8sHHH16sIQqII")
+# section offset and length
+_SECTION = struct.Struct("<QQ")
+
+
+class SnapshotError(Exception):
+    """Snapshot missing, stale or invalid."""
+
+
+def _python_version():
+    """Get Python version tag, marshal data may differ between them."""
+    return sys.version_info[0] << 8 | sys.version_info[1]
+
+
+def _column_names(entry_class):
+    """Get names of fields stored as columns."""
+    names = []
+    index = entry_class.get_index_name()
+    if index is not None:
+        names.append(index)
+    for field in entry_class.get_secondary_index_names():
+        if field not in names:
+            names.append(field)
+    return names
+
+
+def schema_digest(entry_class: Type) -> bytes:
+    """Get digest of the fields stored for an entry class."""
+    schema = [
+        entry_class.__name__,
+        entry_class.get_index_name(),
+        list(entry_class.get_field_names()),
+        _column_names(entry_class),
+    ]
+    return hashlib.md5(json.dumps(schema).encode()).digest()
+
+
+def write_snapshot(path, entry_class, contents: List[Dict], source_stat):
+    """Atomically write snapshot of serialized entries."""
+    fields = list(entry_class.get_field_names())
+    names = _column_names(entry_class)
+
+    sections = [
+        marshal.dumps([entry.get(name) for entry in contents])
+        for name in names
+    ]
+    offsets = array("Q", [0])
+    rows = []
+    for entry in contents:
+        extra = {
+            key: value for key, value in entry.items() if key not in fields
+        }
+        row = marshal.dumps(
+            tuple(entry.get(field) for field in fields) + (extra or None,)
+        )
+        rows.append(row)
+        offsets.append(offsets[-1] + len(row))
+    sections.append(offsets.tobytes())
+    sections.append(b"".join(rows))
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    checksum = 0
+    for data in sections:
+        directory.append(_SECTION.pack(offset, len(data)))
+        offset += len(data)
+        checksum = zlib.crc32(data, checksum)
+
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        _python_version(),
+        marshal.version,
+        schema_digest(entry_class),
+        checksum,
+        source_stat.st_size,
+        source_stat.st_mtime_ns,
+        len(contents),
+        len(names),
+    )
+
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as snapshot:
+            snapshot.write(header)
+            snapshot.writelines(directory)
+            snapshot.writelines(sections)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class SnapshotReader:
+    """Memory-mapped snapshot, decoded on access.
+
+    Behaves as a sequence of serialized entries. Rows are decoded from
+    the mapped file as they are accessed, and columns each time they are
+    requested.
+    """
+
+    def __init__(self, path, entry_class, source_stat=None):
+        """Open snapshot.
+
+        If source_stat is given, the snapshot must have been made from a
+        file with the same size and modification time.
+        """
+        self._fields = list(entry_class.get_field_names())
+        self._names = _column_names(entry_class)
+        self._offsets = None
+        try:
+            with open(path, "rb") as snapshot:
+                self._map = mmap.mmap(
+                    snapshot.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        except (OSError, ValueError):
+            raise SnapshotError("cannot open snapshot")
+
+        try:
+            self._open(entry_class, source_stat)
+        except SnapshotError:
+            self.close()
+            raise
+
+    def _open(self, entry_class, source_stat):
+        """Check header and data, map the row offsets."""
+        try:
+            (
+                magic,
+                version,
+                python_version,
+                marshal_version,
+                digest,
+                checksum,
+                source_size,
+                source_mtime,
+                self._count,
+                column_count,
+            ) = _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            raise SnapshotError("truncated snapshot")
+        if (
+            magic != SNAPSHOT_MAGIC
+            or version != SNAPSHOT_VERSION
+            or python_version != _python_version()
+            or marshal_version != marshal.version
+            or digest != schema_digest(entry_class)
+            or column_count != len(self._names)
+        ):
+            raise SnapshotError("incompatible snapshot")
+        if source_stat is not None and (
+            source_size != source_stat.st_size
+            or source_mtime != source_stat.st_mtime_ns
+        ):
+            raise SnapshotError("stale snapshot")
+
+        sections = []
+        try:
+            for number in range(column_count + 2):
+                offset, length = _SECTION.unpack_from(
+                    self._map, _HEADER.size + _SECTION.size * number
+                )
+                if offset + length > len(self._map):
+                    raise SnapshotError("truncated snapshot")
+                sections.append((offset, length))
+        except struct.error:
+            raise SnapshotError("truncated snapshot")
+        data_offset = _HEADER.size + _SECTION.size * len(sections)
+        # checked in place, without copying the mapped data
+        with memoryview(self._map) as view, view[data_offset:] as data:
+            valid = zlib.crc32(data) == checksum
+        if not valid:
+            raise SnapshotError("corrupted snapshot")
+
+        self._directory = dict(zip(self._names, sections))
+        offsets_start, offsets_length = sections[-2]
+        if offsets_length != 8 * (self._count + 1):
+            raise SnapshotError("corrupted snapshot")
+        self._offsets = memoryview(self._map)[
+            offsets_start : offsets_start + offsets_length
+        ].cast("Q")
+        self._rows_start = sections[-1][0]
+
+    @property
+    def fields(self) -> List[str]:
+        """Get names of fields stored as columns."""
+        return list(self._names)
+
+    def column(self, field) -> List:
+        """Get values of a field for all entries."""
+        if self._offsets is None:
+            raise SnapshotError("snapshot is closed")
+        if field in self._directory:
+            offset, length = self._directory[field]
+            return marshal.loads(self._map[offset : offset + length])
+        return [entry.get(field) for entry in self]
+
+    def __len__(self):
+        """Get number of entries."""
+        return self._count
+
+    def __getitem__(self, position):
+        """Get serialized entry."""
+        offsets = self._offsets
+        if offsets is None:
+            raise SnapshotError("snapshot is closed")
+        if not 0 <= position < self._count:
+            raise IndexError("snapshot index out of range")
+        start = self._rows_start + offsets[position]
+        end = self._rows_start + offsets[position + 1]
+        values = marshal.loads(self._map[start:end])
+        entry = dict(zip(self._fields, values))
+        if values[-1] is not None:
+            entry.update(values[-1])
+        return entry
+
+    def __iter__(self):
+        """Iterate over serialized entries."""
+        for position in range(self._count):
+            yield self[position]
+
+    def close(self):
+        """Unmap snapshot."""
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        self._map.close()
@@ -0,0 +1,571 @@
+"""Registry storage backends."""
+
+import json
+import json.encoder
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Type
+
+from cbcentral.journal import encode_record, decode_record
+from cbcentral.registry.snapshot import (
+    SnapshotError,
+    SnapshotReader,
+    write_snapshot,
+)
+
+
+class StorageError(Exception):
+    """Storage error."""
+
+
+class RegistryStorage:
+    """Persistent storage of registry entries.
+
+    Entries are stored in serialized form. Backends are created with the
+    database path, the registry name and the registry entry class.
+    """
+
+    # whether changes can be stored with append()
+    incremental = False
+
+    def __init__(self, db_path: str, registry_name: str, entry_class: Type):
+        """Initialize."""
+        self._db_path = db_path
+        self._registry_name = registry_name
+        self._entry_class = entry_class
+
+    def load(self) -> List[Dict]:
+        """Get stored entries, in order."""
+        raise NotImplementedError
+
+    def write(self, contents: List[Dict]):
+        """Replace stored entries."""
+        raise NotImplementedError
+
+    def append(self, changes: List[Dict]) -> bool:
+        """Store changes to entries.
+
+        Changes are {"op": "put", "entry": entry} records, which replace
+        the entry with the same index value in place or add it at the end,
+        and {"op": "del", "index": value} records. Returns False if the
+        changes were not stored and all entries must be written instead.
+        """
+        return False
+
+    def mapped(self):
+        """Get stored entries as a memory-mapped sequence.
+
+        Returns None if the backend does not map them.
+        """
+        return None
+
+    def close(self):
+        """Release resources."""
+
+
+class JSONStorage(RegistryStorage):
+    """Registry stored as a JSON file.
+
+    The file is replaced atomically when written. If journal is set,
+    changes are appended to a journal file next to it, which is replayed
+    on load and compacted into the JSON file once it grows larger than it.
+
+    If snapshot is set, a binary snapshot (cbcentral.registry.snapshot) of
+    the JSON file is kept next to it and loaded instead while it is up to
+    date.
+    """
+
+    # smallest journal size that triggers compaction
+    _JOURNAL_MIN_COMPACT = 1 << 16
+
+    def __init__(
+        self,
+        db_path,
+        registry_name,
+        entry_class,
+        journal=False,
+        snapshot=False,
+    ):
+        """Initialize."""
+        super().__init__(db_path, registry_name, entry_class)
+        self._registry_location = os.path.join(
+            db_path, registry_name + ".json"
+        )
+        self._snapshot_location = os.path.join(
+            db_path, registry_name + ".snapshot"
+        )
+        self._snapshot = snapshot
+        self._snapshot_reader = None
+        self._journal_location = os.path.join(
+            db_path, registry_name + ".journal"
+        )
+        self.incremental = journal
+        self._journal_size = 0
+        self._snapshot_size = 0
+
+    def load(self):
+        """Get stored entries, in order."""
+        if not os.path.exists(self._registry_location):
+            try:
+                with open(self._registry_location, "w") as registry:
+                    registry.write("[]")
+
+            except OSError:
+                raise StorageError("cannot create registry")
+
+        try:
+            registry_stat = os.stat(self._registry_location)
+        except OSError:
+            raise StorageError("cannot load registry.")
+        self._snapshot_size = registry_stat.st_size
+        contents = self._load_snapshot(registry_stat)
+        if contents is None:
+            # load registry
+            try:
+                with open(self._registry_location, "r") as registry:
+                    contents = json.load(registry)
+            except (OSError, json.JSONDecodeError):
+                raise StorageError("cannot load registry.")
+            self._save_snapshot(contents, registry_stat)
+        return self._replay_journal(contents)
+
+    def _load_snapshot(self, registry_stat):
+        """Open snapshot, None if it is disabled or not up to date."""
+        if not self._snapshot:
+            return None
+        self._close_snapshot()
+        try:
+            self._snapshot_reader = SnapshotReader(
+                self._snapshot_location, self._entry_class, registry_stat
+            )
+        except SnapshotError:
+            return None
+        return self._snapshot_reader
+
+    def _save_snapshot(self, contents, registry_stat):
+        """Write snapshot of registry file contents if enabled."""
+        if not self._snapshot:
+            return
+        try:
+            write_snapshot(
+                self._snapshot_location,
+                self._entry_class,
+                contents,
+                registry_stat,
+            )
+        except OSError:
+            # registry file is loaded instead
+            pass
+
+    def _close_snapshot(self):
+        """Close snapshot that was loaded."""
+        if self._snapshot_reader is not None:
+            self._snapshot_reader.close()
+            self._snapshot_reader = None
+
+    def _replay_journal(self, contents):
+        """Apply changes recorded in the journal to loaded contents."""
+        if not os.path.exists(self._journal_location):
+            return contents
+        index_key = self._entry_class.get_index_name()
+        if index_key is None:
+            return contents
+        items = {item[index_key]: item for item in contents}
+        valid_size = 0
+        try:
+            with open(self._journal_location, "r") as journal:
+                for line in journal:
+                    record = decode_record(line)
+                    if record is None:
+                        # torn write, nothing after it is valid
+                        break
+                    if record["op"] == "put":
+                        entry = record["entry"]
+                        items[entry[index_key]] = entry
+                    elif record["op"] == "del":
+                        items.pop(record["index"], None)
+                    valid_size += len(line.encode())
+            if valid_size != os.path.getsize(self._journal_location):
+                os.truncate(self._journal_location, valid_size)
+        except OSError:
+            raise StorageError("cannot load registry journal.")
+        self._journal_size = valid_size
+        return list(items.values())
+
+    def append(self, changes):
+        """Append changes to the journal unless it is due for compaction."""
+        if not self.incremental:
+            return False
+        lines = "".join(encode_record(change) for change in changes)
+        journal_size = self._journal_size + len(lines.encode())
+        if journal_size > max(self._snapshot_size, self._JOURNAL_MIN_COMPACT):
+            return False
+        try:
+            with open(self._journal_location, "a") as journal:
+                journal.write(lines)
+                journal.flush()
+                os.fsync(journal.fileno())
+        except OSError:
+            raise StorageError("cannot write registry journal.")
+        self._journal_size = journal_size
+        return True
+
+    def write(self, contents):
+        """Atomically write the registry file and drop the journal."""
+        temp_location = self._registry_location + ".tmp"
+        try:
+            try:
+                with open(temp_location, "w") as registry:
+                    json.dump(contents, registry, indent=2)
+                    registry.flush()
+                    os.fsync(registry.fileno())
+                os.replace(temp_location, self._registry_location)
+            except BaseException:
+                if os.path.exists(temp_location):
+                    os.remove(temp_location)
+                raise
+            # replaying the journal over the new file would be harmless, as
+            # it only holds changes that the file already contains
+            if os.path.exists(self._journal_location):
+                os.remove(self._journal_location)
+            self._sync_directory(self._db_path)
+            registry_stat = os.stat(self._registry_location)
+        except OSError:
+            raise StorageError("cannot commit registry.")
+        self._snapshot_size = registry_stat.st_size
+        self._journal_size = 0
+        # registry views may still read the old snapshot, it is unmapped
+        # once they are gone
+        self._snapshot_reader = None
+        self._save_snapshot(contents, registry_stat)
+
+    def mapped(self):
+        """Get snapshot reader, None if there is no up to date snapshot."""
+        if self._snapshot and self._snapshot_reader is None:
+            try:
+                self._load_snapshot(os.stat(self._registry_location))
+            except OSError:
+                return None
+        return self._snapshot_reader
+
+    def close(self):
+        """Close snapshot."""
+        self._close_snapshot()
+
+    @staticmethod
+    def _sync_directory(path):
+        """Make renames in a directory durable."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            # not supported on every platform
+            pass
+        finally:
+            os.close(fd)
+
+
+def _encode_value(value):
+    """Encode value as JSON, same as json.dumps but faster for scalars."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if type(value) is int:
+        return str(value)
+    if type(value) is str:
+        return json.encoder.encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+class SQLiteStorage(RegistryStorage):
+    """Registry stored in a SQLite database.
+
+    All registries of a database path share one database file, with a
+    table per registry and a column per entry field. Columns hold the
+    JSON encoding of field values, so that other tools can read them, and
+    unknown upstream fields are kept in an "_extra" column. The index
+    field is unique and secondary index fields are indexed, with elements
+    of list values kept in a separate members table so that membership
+    can be looked up as well.
+
+    Changes are stored in one transaction per commit. The database is in
+    WAL mode, so readers in other processes are not blocked by writes.
+    """
+
+    incremental = True
+
+    DATABASE = "registry.sqlite3"
+
+    def __init__(self, db_path, registry_name, entry_class, database=None):
+        """Initialize."""
+        super().__init__(db_path, registry_name, entry_class)
+        self._lock = threading.Lock()
+        self._table = registry_name
+        self._members = registry_name + "__members"
+        self._fields = list(entry_class.get_field_names())
+        self._index = entry_class.get_index_name()
+        self._secondary = list(entry_class.get_secondary_index_names())
+        try:
+            self._connection = sqlite3.connect(
+                os.path.join(db_path, database if database else self.DATABASE),
+                check_same_thread=False,
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+        except sqlite3.Error:
+            raise StorageError("cannot open registry database.")
+
+    @staticmethod
+    def _quote(name):
+        """Quote identifier."""
+        return '"' + name.replace('"', '""') + '"'
+
+    def _create_schema(self):
+        """Create table and indexes, adding columns for new fields."""
+        table = self._quote(self._table)
+        members = self._quote(self._members)
+        columns = self._fields + ["_extra"]
+        with self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                f"({', '.join(self._quote(column) for column in columns)})"
+            )
+            existing = {
+                row[1]
+                for row in self._connection.execute(
+                    f"PRAGMA table_info({table})"
+                )
+            }
+            for column in columns:
+                if column not in existing:
+                    self._connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {self._quote(column)}"
+                    )
+            if self._index is not None:
+                self._connection.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS "
+                    f"{self._quote(self._table + '__' + self._index)} "
+                    f"ON {table} ({self._quote(self._index)})"
+                )
+            for field in self._secondary:
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS "
+                    f"{self._quote(self._table + '__' + field)} "
+                    f"ON {table} ({self._quote(field)})"
+                )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {members} "
+                "(field, value, entry)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS "
+                f"{self._quote(self._members + '__value')} "
+                f"ON {members} (field, value)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS "
+                f"{self._quote(self._members + '__entry')} "
+                f"ON {members} (entry)"
+            )
+        columns = ", ".join(self._quote(column) for column in columns)
+        self._select = f"SELECT {columns} FROM {table}"
+
+    def _row(self, entry):
+        """Get column values of serialized entry."""
+        extra = {
+            key: value
+            for key, value in entry.items()
+            if key not in self._fields
+        }
+        return [_encode_value(entry.get(field)) for field in self._fields] + [
+            json.dumps(extra) if extra else None
+        ]
+
+    def _entry(self, row):
+        """Get serialized entry from column values."""
+        try:
+            # decode all columns at once
+            values = json.loads(
+                "["
+                + ",".join(
+                    value if value is not None else "null" for value in row
+                )
+                + "]"
+            )
+            entry = dict(zip(self._fields, values))
+            if values[-1] is not None:
+                entry.update(values[-1])
+        except (TypeError, ValueError):
+            raise StorageError("corrupted registry entry.")
+        return entry
+
+    def _members_of(self, rowid, entry):
+        """Get member rows of list-valued secondary fields."""
+        return [
+            (field, _encode_value(element), rowid)
+            for field in self._secondary
+            if isinstance(entry.get(field), list)
+            for element in entry[field]
+        ]
+
+    def _insert_members(self, members):
+        """Record elements of list-valued secondary fields."""
+        self._connection.executemany(
+            f"INSERT INTO {self._quote(self._members)} VALUES (?, ?, ?)",
+            members,
+        )
+
+    def _delete_members(self, rowid):
+        """Forget elements recorded for an entry."""
+        self._connection.execute(
+            f"DELETE FROM {self._quote(self._members)} WHERE entry = ?",
+            (rowid,),
+        )
+
+    def _rowid(self, index):
+        """Get row id of entry, None if not stored."""
+        row = self._connection.execute(
+            f"SELECT rowid FROM {self._quote(self._table)} "
+            f"WHERE {self._quote(self._index)} = ?",
+            (_encode_value(index),),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def load(self):
+        """Get stored entries, in order."""
+        with self._lock:
+            try:
+                rows = self._connection.execute(
+                    self._select + " ORDER BY rowid"
+                ).fetchall()
+            except sqlite3.Error:
+                raise StorageError("cannot load registry.")
+        return [self._entry(row) for row in rows]
+
+    def write(self, contents):
+        """Replace stored entries."""
+        columns = ["rowid"] + self._fields + ["_extra"]
+        insert = (
+            f"INSERT OR REPLACE INTO {self._quote(self._table)} "
+            f"({', '.join(self._quote(column) for column in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        rows = []
+        members = []
+        for rowid, entry in enumerate(contents, 1):
+            rows.append([rowid] + self._row(entry))
+            members.extend(self._members_of(rowid, entry))
+        with self._lock:
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        f"DELETE FROM {self._quote(self._table)}"
+                    )
+                    self._connection.execute(
+                        f"DELETE FROM {self._quote(self._members)}"
+                    )
+                    self._connection.executemany(insert, rows)
+                    self._insert_members(members)
+            except sqlite3.Error:
+                raise StorageError("cannot commit registry.")
+
+    def append(self, changes):
+        """Store changes to entries in one transaction."""
+        if self._index is None:
+            return False
+        columns = self._fields + ["_extra"]
+        # columns added for new fields come after "_extra" in the table
+        upsert = (
+            f"INSERT INTO {self._quote(self._table)} "
+            f"({', '.join(self._quote(column) for column in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({self._quote(self._index)}) DO UPDATE SET "
+            + ", ".join(
+                f"{self._quote(column)} = excluded.{self._quote(column)}"
+                for column in columns
+            )
+        )
+        with self._lock:
+            try:
+                with self._connection:
+                    for change in changes:
+                        if change["op"] == "del":
+                            rowid = self._rowid(change["index"])
+                            if rowid is None:
+                                continue
+                            self._delete_members(rowid)
+                            self._connection.execute(
+                                f"DELETE FROM {self._quote(self._table)} "
+                                "WHERE rowid = ?",
+                                (rowid,),
+                            )
+                            continue
+                        entry = change["entry"]
+                        self._connection.execute(upsert, self._row(entry))
+                        rowid = self._rowid(entry[self._index])
+                        self._delete_members(rowid)
+                        self._insert_members(self._members_of(rowid, entry))
+            except sqlite3.Error:
+                raise StorageError("cannot commit registry.")
+        return True
+
+    def get(self, index) -> Optional[Dict]:
+        """Get stored entry by index value, None if not stored."""
+        with self._lock:
+            row = self._connection.execute(
+                self._select + f" WHERE {self._quote(self._index)} = ?",
+                (_encode_value(index),),
+            ).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def find(self, **criteria) -> List[Dict]:
+        """Get stored entries matching all criteria.
+
+        Secondary index fields with list values match if they contain the
+        value, other fields must be equal to it.
+        """
+        conditions = []
+        parameters = []
+        for field, value in criteria.items():
+            if field not in self._fields:
+                raise ValueError(f"unknown field: {field}")
+            encoded = _encode_value(value)
+            if field in self._secondary:
+                conditions.append(
+                    f"({self._quote(field)} = ? OR rowid IN "
+                    f"(SELECT entry FROM {self._quote(self._members)} "
+                    "WHERE field = ? AND value = ?))"
+                )
+                parameters.extend((encoded, field, encoded))
+            else:
+                conditions.append(f"{self._quote(field)} = ?")
+                parameters.append(encoded)
+        query = self._select
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            rows = self._connection.execute(
+                query + " ORDER BY rowid", parameters
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def __len__(self):
+        """Get number of stored entries."""
+        with self._lock:
+            (count,) = self._connection.execute(
+                f"SELECT COUNT(*) FROM {self._quote(self._table)}"
+            ).fetchone()
+        return count
+
+    def close(self):
+        """Close database connection."""
+        with self._lock:
+            self._connection.close()
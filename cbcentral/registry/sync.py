@@ -0,0 +1,156 @@
+"""Synchronize several registries at once."""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from cbcentral import tracing
+from cbcentral.registry import LocalRegistry, RegistryError
+
+
+class RegistrySync:
+    """Fetch registries concurrently and apply them together.
+
+    Upstream contents of all registries are fetched at the same time. If
+    any fetch fails nothing is applied, otherwise registries are applied
+    in dependency order and then all committed. If any step fails, the
+    API validators are forgotten so that the next sync fetches everything
+    again.
+    """
+
+    def __init__(self, registries: Iterable[LocalRegistry], api_obj):
+        """Initialize."""
+        self._registries = self._sort_registries(list(registries))
+        self._api = api_obj
+
+    @staticmethod
+    def _sort_registries(registries):
+        """Order registries so that dependencies come first."""
+        by_name = {registry.name: registry for registry in registries}
+        ordered = []
+        visiting = set()
+
+        def _visit(registry):
+            if registry in ordered:
+                return
+            if registry.name in visiting:
+                raise RegistryError("circular registry dependency")
+            visiting.add(registry.name)
+            for dependency in registry.get_dependencies():
+                if dependency in by_name:
+                    _visit(by_name[dependency])
+            visiting.discard(registry.name)
+            ordered.append(registry)
+
+        for registry in registries:
+            _visit(registry)
+        return ordered
+
+    @property
+    def registries(self):
+        """Get registries in the order they are applied."""
+        return list(self._registries)
+
+    @staticmethod
+    def _timed(function, *args):
+        """Call function, return result and elapsed time."""
+        start = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - start
+
+    def _apply_all(self, fetched, report):
+        """Apply fetched contents in order."""
+        for registry in self._registries:
+            contents = fetched[registry.name]
+            if contents is None:
+                # not modified
+                _, elapsed = self._timed(registry.apply_unchanged, self._api)
+            else:
+                _, elapsed = self._timed(
+                    registry.apply_upstream, contents, self._api
+                )
+            report[registry.name]["apply"] = elapsed
+
+    def _commit_all(self, report):
+        """Commit modified registries.
+
+        Registries left modified by an earlier failed sync are committed
+        too, even if not modified upstream since.
+        """
+        for registry in self._registries:
+            if not registry.dirty:
+                continue
+            _, elapsed = self._timed(registry.commit_registry)
+            report[registry.name]["commit"] = elapsed
+
+    def sync(self):
+        """Synchronize registries.
+
+        Returns per-registry timings, in seconds, of each step.
+        """
+        with tracing.span("registry.sync", registries=len(self._registries)):
+            report = {
+                registry.name: {"fetch": 0.0, "apply": 0.0, "commit": 0.0}
+                for registry in self._registries
+            }
+            with ThreadPoolExecutor(
+                max_workers=max(1, len(self._registries))
+            ) as pool:
+                futures = {
+                    registry.name: pool.submit(
+                        self._timed, registry.fetch_upstream, self._api
+                    )
+                    for registry in self._registries
+                }
+            fetched = {}
+            try:
+                for name, future in futures.items():
+                    fetched[name], report[name]["fetch"] = future.result()
+                self._apply_all(fetched, report)
+                self._commit_all(report)
+            except Exception:
+                # contents not applied or committed must be fetched again
+                self._api.forget_validators()
+                raise
+            return report
+
+    async def sync_async(self):
+        """Synchronize registries using asyncio."""
+        with tracing.span("registry.sync", registries=len(self._registries)):
+            report = {
+                registry.name: {"fetch": 0.0, "apply": 0.0, "commit": 0.0}
+                for registry in self._registries
+            }
+
+            async def _fetch(registry):
+                start = time.perf_counter()
+                contents = await registry.fetch_upstream_async(self._api)
+                report[registry.name]["fetch"] = time.perf_counter() - start
+                return contents
+
+            results = await asyncio.gather(
+                *[_fetch(registry) for registry in self._registries],
+                return_exceptions=True,
+            )
+            try:
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+                for registry, contents in zip(self._registries, results):
+                    start = time.perf_counter()
+                    if contents is None:
+                        await registry.apply_unchanged_async(self._api)
+                    else:
+                        await registry.apply_upstream_async(
+                            contents, self._api
+                        )
+                    report[registry.name]["apply"] = (
+                        time.perf_counter() - start
+                    )
+                self._commit_all(report)
+            except Exception:
+                # contents not applied or committed must be fetched again
+                self._api.forget_validators()
+                raise
+            return report
@@ -0,0 +1,132 @@
+"""Registry views."""
+
+from typing import Dict, Type
+
+
+class RegistryView:
+    """Immutable version of registry contents and indexes.
+
+    A registry publishes a new view each time its contents change, so a
+    view can be read from any thread without locking and is never seen
+    half built.
+    """
+
+    __slots__ = (
+        "_entry_class",
+        "_contents",
+        "_index",
+        "_secondary_indexes",
+        "_fingerprints",
+    )
+
+    def __init__(
+        self,
+        entry_class: Type,
+        contents=(),
+        index: Dict = None,
+        secondary_indexes: Dict = None,
+        fingerprints: Dict = None,
+    ):
+        """Initialize.
+
+        contents is a sequence of entries, index maps index values to
+        positions in it and secondary indexes map each field to values
+        and lists of positions. fingerprints map fingerprints of the
+        upstream records the entries were built from to positions.
+        """
+        self._entry_class = entry_class
+        self._contents = contents
+        self._index = index if index is not None else {}
+        self._secondary_indexes = (
+            secondary_indexes if secondary_indexes is not None else {}
+        )
+        self._fingerprints = fingerprints if fingerprints is not None else {}
+
+    @property
+    def contents(self):
+        """Get entries."""
+        return self._contents
+
+    @property
+    def index(self) -> Dict:
+        """Get index."""
+        return self._index
+
+    @property
+    def secondary_indexes(self) -> Dict:
+        """Get secondary indexes."""
+        return self._secondary_indexes
+
+    @property
+    def fingerprints(self) -> Dict:
+        """Get upstream record fingerprints."""
+        return self._fingerprints
+
+    def with_contents(self, contents):
+        """Get view of the same entries stored in other contents."""
+        return RegistryView(
+            self._entry_class,
+            contents,
+            self._index,
+            self._secondary_indexes,
+            self._fingerprints,
+        )
+
+    @staticmethod
+    def _matches(entry, field, value):
+        """Check if entry field matches value."""
+        entry_value = getattr(entry, field)
+        if isinstance(entry_value, list):
+            return value in entry_value
+        return entry_value == value
+
+    def find(self, **criteria):
+        """Find entries matching all criteria.
+
+        List-valued fields match if they contain the value. Criteria on
+        the index or on secondary indexes are answered from the indexes,
+        other fields are filtered by scanning the candidates.
+        """
+        candidates = None
+        for field, value in criteria.items():
+            if field == self._entry_class.get_index_name():
+                matches = [self._index[value]] if value in self else []
+            elif field in self._secondary_indexes:
+                try:
+                    matches = self._secondary_indexes[field].get(value, [])
+                except TypeError:
+                    matches = []
+            else:
+                continue
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        if candidates is None:
+            entries = iter(self._contents)
+        else:
+            entries = (self._contents[position] for position in candidates)
+
+        return [
+            entry
+            for entry in entries
+            if all(
+                self._matches(entry, field, value)
+                for field, value in criteria.items()
+            )
+        ]
+
+    def __getitem__(self, item):
+        """Get entry by index value."""
+        return self._contents[self._index[item]]
+
+    def __iter__(self):
+        """Get iterator."""
+        return iter(self._contents)
+
+    def __contains__(self, item):
+        """Contains or not."""
+        return item in self._index
+
+    def __len__(self):
+        """Get number of entries."""
+        return len(self._contents)
@@ -0,0 +1,209 @@
+"""Tracing hooks.
+
+API calls, registry operations and SFX handling are wrapped in spans,
+which are passed to the registered hooks (TraceHook) when they start and
+end. Spans are not created while no hook is registered.
+
+ChromeTraceHook records spans in the Chrome trace event format, which
+can be opened in chrome://tracing or Perfetto:
+
+    with ChromeTraceHook("sync.json"):
+        registry_sync.sync()
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from logging import getLogger
+
+TRACING_LOGGER = getLogger("cbcentral.tracing")
+
+# replaced, not modified, so it can be read without locking
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+class TraceHook:
+    """Receives spans when they start and end."""
+
+    def span_start(self, span):
+        """Span started."""
+
+    def span_end(self, span):
+        """Span ended."""
+
+
+def add_hook(hook: TraceHook):
+    """Register hook."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook: TraceHook):
+    """Unregister hook."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(other for other in _hooks if other is not hook)
+
+
+def enabled() -> bool:
+    """Get whether any hook is registered."""
+    return bool(_hooks)
+
+
+class Span:
+    """Timed operation with attributes.
+
+    Times are time.perf_counter() values. Spans started in an asyncio
+    task belong to the task rather than to the thread running it.
+    """
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "start",
+        "end",
+        "lane",
+        "lane_name",
+        "_hooks",
+    )
+
+    def __init__(self, name, attributes, hooks):
+        """Initialize."""
+        self.name = name
+        self.attributes = attributes
+        self.start = None
+        self.end = None
+        self._hooks = hooks
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            # no running event loop
+            task = None
+        if task is not None:
+            self.lane = id(task)
+            self.lane_name = task.get_name()
+        else:
+            self.lane = threading.get_ident()
+            self.lane_name = threading.current_thread().name
+
+    def set(self, **attributes):
+        """Set attributes."""
+        self.attributes.update(attributes)
+
+    def _call_hooks(self, method):
+        """Pass span to hooks."""
+        for hook in self._hooks:
+            try:
+                getattr(hook, method)(self)
+            except Exception:
+                TRACING_LOGGER.exception("trace hook failed")
+
+    def __enter__(self):
+        """Start span."""
+        self.start = time.perf_counter()
+        self._call_hooks("span_start")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """End span."""
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self._call_hooks("span_end")
+        return False
+
+
+class _NullSpan:
+    """Span used while no hook is registered."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        """Ignore attributes."""
+
+    def __enter__(self):
+        """Do nothing."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Do nothing."""
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attributes):
+    """Get span to be used as a context manager."""
+    hooks = _hooks
+    if not hooks:
+        return _NULL_SPAN
+    return Span(name, attributes, hooks)
+
+
+class ChromeTraceHook(TraceHook):
+    """Record spans as Chrome trace events.
+
+    Events are kept in memory and written to path by write(). Used as a
+    context manager, the hook is registered while in the context and the
+    events are written when leaving it.
+    """
+
+    def __init__(self, path):
+        """Initialize."""
+        self._path = path
+        self._events = []
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def span_end(self, span):
+        """Record span."""
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".")[0],
+            "ph": "X",
+            "ts": (span.start - self._origin) * 1e6,
+            "dur": (span.end - span.start) * 1e6,
+            "pid": self._pid,
+            "tid": span.lane,
+            "args": span.attributes,
+        }
+        with self._lock:
+            self._events.append(event)
+            self._lanes.setdefault(span.lane, span.lane_name)
+
+    def write(self):
+        """Write recorded events."""
+        with self._lock:
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": lane,
+                    "args": {"name": name},
+                }
+                for lane, name in self._lanes.items()
+            ] + self._events
+        with open(self._path, "w") as trace:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"},
+                trace,
+                default=str,
+            )
+
+    def __enter__(self):
+        """Register hook."""
+        add_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Unregister hook and write events."""
+        remove_hook(self)
+        self.write()
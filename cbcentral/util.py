@@ -1,11 +1,31 @@
 """Central server access utilities."""
 
+import base64
 import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
 
 
 def id_from_url(url):
-    """Get player id from URL."""
-    return url.strip("/").split("/")[-1]
+    """Get player id from URL.
+
+    Ids are interned, so entries of all registries share them.
+    """
+    if "/" not in url:
+        # already an id
+        return sys.intern(url)
+    return sys.intern(url.strip("/").split("/")[-1])
+
+
+def intern_value(value):
+    """Intern value if it is a string."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
 
 
 def md5_sum(file_name):
@@ -16,3 +36,208 @@ def md5_sum(file_name):
             hash_md5.update(chunk)
 
     return hash_md5.hexdigest()
+
+
+class ChecksumCache:
+    """Persistent MD5 sums of files.
+
+    Sums are reused while the size, modification time and inode of the
+    file are unchanged. A sum recorded within the filesystem timestamp
+    granularity of the last modification is not trusted, since the file
+    could still change without its modification time changing.
+    """
+
+    # coarsest timestamp granularity expected (FAT)
+    _RACY_NS = 2_000_000_000
+
+    def __init__(self, cache_path):
+        """Initialize."""
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(cache_path, "r") as cache_file:
+                self._entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def _file_key(stat):
+        """Get file status used to validate a sum."""
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def md5_sum(self, file_name):
+        """Get MD5 sum, calculating it only if the file changed."""
+        stat = os.stat(file_name)
+        key = self._file_key(stat)
+        with self._lock:
+            entry = self._entries.get(file_name)
+        if entry is not None and entry["key"] == key and not entry["racy"]:
+            return entry["md5"]
+
+        checksum = md5_sum(file_name)
+        with self._lock:
+            self._entries[file_name] = {
+                "key": key,
+                "md5": checksum,
+                "racy": time.time_ns() - stat.st_mtime_ns < self._RACY_NS,
+            }
+            self._dirty = True
+        return checksum
+
+    def record(self, file_name, checksum):
+        """Record known sum of a file that was just written."""
+        stat = os.stat(file_name)
+        with self._lock:
+            self._entries[file_name] = {
+                "key": self._file_key(stat),
+                "md5": checksum,
+                "racy": time.time_ns() - stat.st_mtime_ns < self._RACY_NS,
+            }
+            self._dirty = True
+
+    def forget(self, file_name):
+        """Forget sum of file."""
+        with self._lock:
+            if self._entries.pop(file_name, None) is not None:
+                self._dirty = True
+
+    def prune(self, file_names):
+        """Forget sums of files not in file_names."""
+        keep = set(file_names)
+        with self._lock:
+            for file_name in list(self._entries):
+                if file_name not in keep:
+                    del self._entries[file_name]
+                    self._dirty = True
+
+    def save(self):
+        """Save cache if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_path = self._cache_path + ".tmp"
+            try:
+                with open(temp_path, "w") as cache_file:
+                    json.dump(self._entries, cache_file)
+                os.replace(temp_path, self._cache_path)
+            except OSError:
+                return
+            self._dirty = False
+
+
+class JSONFieldStream:
+    """Extract a top-level string field from a JSON object as it streams.
+
+    Chunks of the document are fed in order. The contents of the field are
+    returned as they are found and never kept, everything else is kept
+    and parsed when done, with the streamed field replaced by "".
+    """
+
+    _ESCAPES = {ord("/"): b"/", ord("\\"): b"\\", ord('"'): b'"'}
+    _FIELD_SPECIAL = re.compile(rb'["\\]')
+
+    def __init__(self, field):
+        """Initialize."""
+        self._field = field.encode()
+        self._rest = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._last_string = None
+        self._expect_value = False
+        self._in_field = False
+        self.found = False
+
+    def feed(self, chunk):
+        """Feed chunk, return field contents found in it."""
+        field_data = bytearray()
+        rest = self._rest
+        position = 0
+        length = len(chunk)
+        while position < length:
+            if self._in_field and not self._escape:
+                # copy field contents up to the next special character
+                match = self._FIELD_SPECIAL.search(chunk, position)
+                end = match.start() if match is not None else length
+                field_data += chunk[position:end]
+                position = end
+                if position == length:
+                    break
+
+            byte = chunk[position]
+            position += 1
+            if self._in_field:
+                if self._escape:
+                    self._escape = False
+                    if byte in self._ESCAPES:
+                        field_data += self._ESCAPES[byte]
+                    elif byte not in b"nrt":
+                        # whitespace is dropped, others are not expected
+                        raise ValueError("unsupported escape in field")
+                elif byte == 0x5C:
+                    self._escape = True
+                else:
+                    # closing quote
+                    self._in_field = False
+                    rest += b'""'
+                continue
+
+            if self._in_string:
+                rest.append(byte)
+                if self._escape:
+                    self._escape = False
+                elif byte == 0x5C:
+                    self._escape = True
+                elif byte == 0x22:
+                    self._in_string = False
+                    self._last_string = bytes(self._string)
+                else:
+                    self._string.append(byte)
+                continue
+
+            if self._expect_value and byte not in b" \t\r\n":
+                self._expect_value = False
+                if byte == 0x22:
+                    self._in_field = True
+                    self.found = True
+                    continue
+
+            rest.append(byte)
+            if byte == 0x22:
+                self._in_string = True
+                self._string = bytearray()
+            elif byte in b"{[":
+                self._depth += 1
+            elif byte in b"}]":
+                self._depth -= 1
+            elif byte == 0x3A and self._depth == 1:
+                self._expect_value = self._last_string == self._field
+        return bytes(field_data)
+
+    def finish(self):
+        """Parse the rest of the document."""
+        if self._in_field or self._in_string or self._depth != 0:
+            raise ValueError("truncated document")
+        return json.loads(self._rest)
+
+
+class Base64StreamDecoder:
+    """Decode base64 data fed in arbitrary pieces."""
+
+    def __init__(self):
+        """Initialize."""
+        self._pending = b""
+
+    def feed(self, data):
+        """Decode data, return decoded bytes available so far."""
+        data = self._pending + bytes(data).translate(None, b" \t\r\n")
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable], validate=True)
+
+    def finish(self):
+        """Check that no data is left over."""
+        if self._pending:
+            raise ValueError("truncated base64 data")
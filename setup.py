@@ -7,6 +7,7 @@ setup(
     version="1.0",
     packages=find_packages(),
     install_requires=["requests>=2.24.0"],
+    extras_require={"async": ["aiohttp>=3.7"]},
     author="Bruno Morais",
     author_email="brunosmmm@gmail.com",
     description="Access centralized API and databases",
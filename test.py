@@ -5,6 +5,7 @@ from cbcentral.localdb.game import LocalGameRegistry
 from cbcentral.localdb.tournament import LocalTournamentRegistry
 from cbcentral.localdb.player import LocalPlayerRegistry
 from cbcentral.api import ChainballCentralAPI
+from cbcentral.registry.sync import RegistrySync
 
 import logging
 
@@ -31,14 +32,15 @@ if __name__ == "__main__":
     announcement_registry = LocalAnnounceRegistry(DB_PATH)
     player_registry = LocalPlayerRegistry(DB_PATH, SFX_PATH)
 
-    # download data
-    game_registry.update_registry(api)
-    tournament_registry.update_registry(api)
-    announcement_registry.update_registry(api)
-    player_registry.update_registry(api)
-
-    # save
-    game_registry.commit_registry()
-    tournament_registry.commit_registry()
-    announcement_registry.commit_registry()
-    player_registry.commit_registry()
+    # download data and save
+    registry_sync = RegistrySync(
+        [
+            game_registry,
+            tournament_registry,
+            announcement_registry,
+            player_registry,
+        ],
+        api,
+    )
+    for name, timings in registry_sync.sync().items():
+        logger.info(f"{name}: {timings}")
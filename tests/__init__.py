@@ -0,0 +1 @@
+"""Regression tests."""
@@ -0,0 +1,18 @@
+"""Shared fixtures."""
+
+import threading
+
+import pytest
+
+from tests.helpers import FakeCentralServer
+
+
+@pytest.fixture
+def server():
+    """Get running fake central server."""
+    fake = FakeCentralServer()
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.shutdown()
+    fake.server_close()
@@ -0,0 +1,101 @@
+"""Test helpers: a fake central server and polling."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler of the fake central server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, body=b"", headers=None):
+        """Send reply."""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Serve collections, with an ETag if set."""
+        server = self.server
+        path = self.path.strip("/")
+        if server.raw_body is not None:
+            self._reply(200, server.raw_body)
+            return
+        if path not in server.collections:
+            self._reply(404)
+            return
+        if (
+            server.etag is not None
+            and self.headers.get("If-None-Match") == server.etag
+        ):
+            self._reply(304)
+            return
+        headers = {"ETag": server.etag} if server.etag is not None else {}
+        self._reply(
+            200, json.dumps(server.collections[path]).encode(), headers
+        )
+
+    def do_POST(self):
+        """Record posted data."""
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if server.post_delay and not server.posts:
+            server.post_delay_started.set()
+            time.sleep(server.post_delay)
+        server.posts.append(form)
+        if server.raw_body is not None:
+            self._reply(200, server.raw_body)
+            return
+        self._reply(200, b'{"status": "ok"}')
+
+    def log_message(self, *args):
+        """Be quiet."""
+
+
+class FakeCentralServer(ThreadingHTTPServer):
+    """Fake central server.
+
+    Serves collections by path, optionally with an ETag, and records
+    posted forms. If raw_body is set, it is sent as a 200 response to
+    every request instead. The first POST is delayed by post_delay.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        """Initialize."""
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.collections = {}
+        self.etag = None
+        self.raw_body = None
+        self.post_delay = 0.0
+        self.post_delay_started = threading.Event()
+        self.posts = []
+
+    @property
+    def address(self):
+        """Get server URL."""
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def posted(self, field):
+        """Get values of a form field in posted order."""
+        return [form[field][0] for form in self.posts if field in form]
+
+
+def wait_for(condition, timeout=5.0):
+    """Wait until condition() is true, return whether it became true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
@@ -0,0 +1,70 @@
+"""Conditional registry fetches when storing the registry fails."""
+
+import json
+import os
+
+import pytest
+
+from benchmarks.synth import make_collections
+from cbcentral.api import ChainballCentralAPI
+from cbcentral.localdb.announcement import LocalAnnounceRegistry
+from cbcentral.localdb.game import LocalGameRegistry
+from cbcentral.registry import RegistryError
+
+
+@pytest.fixture
+def collections(server):
+    """Get collections served with an ETag."""
+    server.etag = '"v1"'
+    server.collections = make_collections("small")
+    return server.collections
+
+
+def _fail_first_commit(registry):
+    """Make the first commit of the registry fail."""
+    commit = registry.commit_registry
+    calls = []
+
+    def _commit():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RegistryError("disk full")
+        commit()
+
+    registry.commit_registry = _commit
+
+
+def _stored(path, name):
+    """Get entries stored in a JSON registry file."""
+    with open(os.path.join(path, name), "r") as registry_file:
+        return json.load(registry_file)
+
+
+def test_failed_update_forgets_validator(server, collections, tmp_path):
+    registry = LocalAnnounceRegistry(str(tmp_path))
+    _fail_first_commit(registry)
+    with ChainballCentralAPI(server.address) as api:
+        with pytest.raises(RegistryError):
+            registry.update_registry(api)
+        assert not any("announce" in url for url in api._validators)
+        # not modified would otherwise skip what failed to be stored
+        registry.update_registry(api)
+    assert not registry.dirty
+    stored = _stored(tmp_path, "announce_registry.json")
+    assert len(stored) == len(collections["api/announce"])
+
+
+def test_unchanged_update_commits_dirty_registry(
+    server, collections, tmp_path
+):
+    registry = LocalGameRegistry(str(tmp_path))
+    _fail_first_commit(registry)
+    with ChainballCentralAPI(server.address) as api:
+        registry.update_registry(api)
+        with pytest.raises(RegistryError):
+            registry.commit_registry()
+        assert registry.dirty
+        registry.update_registry(api)
+    assert not registry.dirty
+    stored = _stored(tmp_path, "game_registry.json")
+    assert len(stored) == len(collections["api/games"])
@@ -0,0 +1,159 @@
+"""Outgoing queue delivery and worker error handling."""
+
+import asyncio
+
+import pytest
+
+from cbcentral.api import CBCentralAPIError, ChainballCentralAPI
+from tests.helpers import wait_for
+
+HTML = b"<html><body>Please log in</body></html>"
+
+
+def _api(server, **kwargs):
+    """Get API client with quick backoff."""
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.01)
+    return ChainballCentralAPI(server.address, **kwargs)
+
+
+def test_get_invalid_json_raises_api_error(server):
+    server.raw_body = HTML
+    with _api(server) as api:
+        with pytest.raises(CBCentralAPIError):
+            api.central_api_get("api", "games")
+
+
+def test_post_invalid_json_is_dead_lettered(server):
+    server.raw_body = HTML
+    with _api(server, max_attempts=2) as api:
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        assert wait_for(lambda: (api.process_queue(), api.dead_letters)[1])
+        assert api.queue_length == 0
+
+
+def test_worker_survives_invalid_json(server):
+    server.raw_body = HTML
+    with _api(server, max_attempts=2) as api:
+        api.start_worker()
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        assert wait_for(lambda: api.dead_letters)
+        server.raw_body = None
+        api.push_post_request({"n": 1}, "api", "live", group="g")
+        assert wait_for(lambda: api.queue_length == 0)
+        assert api._worker.is_alive()
+
+
+def test_worker_survives_unexpected_error(server):
+    with _api(server) as api:
+        deliver = api._deliver
+        calls = []
+
+        def _failing_deliver(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise RuntimeError("unexpected")
+            return deliver(batch)
+
+        api._deliver = _failing_deliver
+        api.start_worker()
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        assert wait_for(lambda: server.posts)
+        assert api._worker.is_alive()
+        assert api.queue_length == 0
+        assert server.posted("n") == ["0"]
+
+
+def test_group_order_with_worker_and_manual_processing(server):
+    server.post_delay = 0.3
+    with _api(server) as api:
+        api.start_worker()
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        assert server.post_delay_started.wait(5)
+        api.push_post_request({"n": 1}, "api", "live", group="g")
+        # first request of the group is still in flight
+        api.process_queue()
+        assert wait_for(lambda: len(server.posts) == 2)
+        assert server.posted("n") == ["0", "1"]
+
+
+def test_async_invalid_json_releases_lane(server):
+    from cbcentral.asyncapi import AsyncChainballCentralAPI
+
+    server.raw_body = HTML
+
+    async def _run():
+        async with AsyncChainballCentralAPI(
+            server.address,
+            max_attempts=2,
+            backoff_base=0.01,
+            backoff_max=0.01,
+        ) as api:
+            api.push_post_request({"n": 0}, "api", "live", group="g")
+            for _ in range(100):
+                await api.process_queue()
+                if api.dead_letters:
+                    break
+                await asyncio.sleep(0.01)
+            assert api.dead_letters
+            assert not api._in_flight
+            server.raw_body = None
+            api.push_post_request({"n": 1}, "api", "live", group="g")
+            await api.process_queue()
+            assert api.queue_length == 0
+
+    asyncio.run(_run())
+
+
+def test_async_unexpected_error_releases_lane(server):
+    from cbcentral.asyncapi import AsyncChainballCentralAPI
+
+    async def _run():
+        async with AsyncChainballCentralAPI(
+            server.address, backoff_base=0.01, backoff_max=0.01
+        ) as api:
+            post = api._central_api_post
+            calls = []
+
+            async def _failing_post(**kwargs):
+                calls.append(kwargs)
+                if len(calls) == 1:
+                    raise RuntimeError("unexpected")
+                return await post(**kwargs)
+
+            api._central_api_post = _failing_post
+            api.push_post_request({"n": 0}, "api", "live", group="g")
+            for _ in range(100):
+                await api.process_queue()
+                if not api.queue_length:
+                    break
+                await asyncio.sleep(0.01)
+            assert api.queue_length == 0
+            assert not api._in_flight
+            assert server.posted("n") == ["0"]
+
+    asyncio.run(_run())
+
+
+def test_open_breaker_holds_queue():
+    with ChainballCentralAPI(
+        "http://127.0.0.1:9", retries=0, breaker_threshold=1
+    ) as api:
+        with pytest.raises(CBCentralAPIError):
+            api.central_api_get("api", "games", timeout=0.5)
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        api.process_queue()
+        assert api.queue_length == 1
+        assert not api.dead_letters
+        assert not api._in_flight
+
+
+def test_stop_worker_after_errors(server):
+    server.raw_body = HTML
+    with _api(server, max_attempts=1) as api:
+        api.start_worker()
+        api.push_post_request({"n": 0}, "api", "live", group="g")
+        assert wait_for(lambda: api.dead_letters)
+        worker = api._worker
+        api.stop_worker(timeout=5)
+        assert not worker.is_alive()
@@ -0,0 +1,84 @@
+"""SQLite registry storage and schema changes."""
+
+import pytest
+
+from cbcentral.registry.entry import LocalRegistryEntry
+from cbcentral.registry.storage import SQLiteStorage, StorageError
+
+
+class OldEntry(LocalRegistryEntry):
+    """Entry of an older schema."""
+
+    _index = "name"
+    _fields = ["name", "score"]
+
+
+class NewEntry(LocalRegistryEntry):
+    """Entry with a field added since."""
+
+    _index = "name"
+    _fields = ["name", "score", "court"]
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """Get storage opened with a new field on a table of the old schema."""
+    storage = SQLiteStorage(tmp_path, "registry", OldEntry)
+    storage.write([{"name": "a", "score": 1, "extra": "x"}])
+    storage.close()
+    storage = SQLiteStorage(tmp_path, "registry", NewEntry)
+    yield storage
+    storage.close()
+
+
+def test_load_after_adding_field(migrated):
+    assert migrated.load() == [
+        {"name": "a", "score": 1, "court": None, "extra": "x"}
+    ]
+
+
+def test_append_after_adding_field(migrated):
+    assert migrated.append(
+        [
+            {
+                "op": "put",
+                "entry": {"name": "b", "score": 2, "court": 3, "more": "y"},
+            },
+            {
+                "op": "put",
+                "entry": {"name": "a", "score": 5, "court": 1},
+            },
+        ]
+    )
+    assert migrated.load() == [
+        {"name": "a", "score": 5, "court": 1},
+        {"name": "b", "score": 2, "court": 3, "more": "y"},
+    ]
+    assert migrated.get("b") == {
+        "name": "b",
+        "score": 2,
+        "court": 3,
+        "more": "y",
+    }
+    assert migrated.find(court=3) == [migrated.get("b")]
+
+
+def test_append_after_adding_field_survives_reopening(migrated, tmp_path):
+    migrated.append(
+        [{"op": "put", "entry": {"name": "b", "score": 2, "court": 3}}]
+    )
+    migrated.close()
+    storage = SQLiteStorage(tmp_path, "registry", NewEntry)
+    try:
+        assert [entry["name"] for entry in storage.load()] == ["a", "b"]
+    finally:
+        storage.close()
+
+
+def test_corrupted_row_raises_storage_error(migrated):
+    with migrated._connection:
+        migrated._connection.execute(
+            "UPDATE registry SET _extra = ?", ('"not an object"',)
+        )
+    with pytest.raises(StorageError):
+        migrated.load()